@@ -813,7 +813,9 @@ class ZarrWrite:
         chunk_idx = tuple(
             chunk_time_range if dims_of_arrays[var_name][1].index(i) == timaxis else slice(0, i) for i in
             dims_of_arrays[var_name][1])
-        self.rootgroup[var_name][chunk_idx] = zarr.array(xarr_data, shape=dims_of_arrays[var_name][1], chunks=chunksize)
+        # write the numpy block straight into the rootgroup array.  zarr splits it along the rootgroup chunk grid, building
+        #  an in memory zarr array with chunksize first just encodes the block into chunks that get decoded again on write
+        self.rootgroup[var_name][chunk_idx] = xarr_data
 
     def _write_existing_rootgroup(self, xarr: xr.Dataset, data_loc_copy: Union[list, np.ndarray], var_name: str, dims_of_arrays: dict,
                                   chunksize: tuple, timlength: int, timaxis: int, startingshp: tuple, push_forward: list):
@@ -917,6 +919,9 @@ class ZarrWrite:
                                                fill_value=self._get_arr_nodatavalue(xarr[var_name].dtype))
         newarr[:] = xarr[var_name].values
         newarr.resize(startingshp)
+        # _ARRAY_DIMENSIONS is used by xarray for connecting dimensions with zarr arrays.  Only written when the array
+        #  is created, the dimension names never change on later writes
+        newarr.attrs['_ARRAY_DIMENSIONS'] = dims_of_arrays[var_name][0]
 
     def write_to_zarr(self, xarr: xr.Dataset, attrs: dict, dataloc: Union[list, np.ndarray], finalsize: int = None,
                       push_forward: list = None):
@@ -976,9 +981,6 @@ class ZarrWrite:
                                                    timaxis, None, None)
             else:
                 self._write_new_dataset_rootgroup(xarr, var, dims_of_arrays, chunksize, startingshp)
-
-            # _ARRAY_DIMENSIONS is used by xarray for connecting dimensions with zarr arrays
-            self.rootgroup[var].attrs['_ARRAY_DIMENSIONS'] = dims_of_arrays[var][0]
         return self.zarr_path
 
 
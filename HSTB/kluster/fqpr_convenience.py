@@ -442,12 +442,13 @@ def _add_points_to_surface(fqpr_inst: Fqpr, bgrid: BathyGrid, fqpr_crs: int, fqp
         print('Adding points from {} in {} chunks...\n'.format(os.path.split(fqpr_inst.output_folder)[1], totalchunks))
         for idx in range(totalchunks):
             strt, end = idx * chunksize, min((idx + 1) * chunksize, number_of_pings)
-            data = rp.isel(time=slice(strt, end)).stack({'sounding': ('time', 'beam')})
-            # drop nan values in georeferenced data, generally where number of beams vary between pings
-            data = data.where(~np.isnan(data['z']), drop=True)
-            # filter out rejected soundings, i.e. where detectioninfo = 2
-            data = data.where(data['detectioninfo'] != kluster_variables.rejected_flag, drop=True)
-            data = data.drop_vars(['detectioninfo'])
+            chnk = rp.isel(time=slice(strt, end))
+            # drop nan values in georeferenced data, generally where number of beams vary between pings, and filter out
+            #  rejected soundings, i.e. where detectioninfo = 2.  Build one mask on the flattened (time, beam) arrays
+            #  instead of stacking and running where(drop=True) twice over every variable
+            valid = ~np.isnan(chnk['z'].values.ravel())
+            valid &= chnk['detectioninfo'].values.ravel() != kluster_variables.rejected_flag
+            data = xr.Dataset({varname: ('sounding', chnk[varname].values.ravel()[valid]) for varname in chnk.data_vars if varname != 'detectioninfo'})
             bgrid.add_points(data, '{}_{}'.format(cont_name, cont_name_idx), multibeamfiles, fqpr_crs, fqpr_vertref,
                              min_time=mintime, max_time=maxtime)
             cont_name_idx += 1
@@ -13,7 +13,7 @@ from HSTB.drivers import kmall, par3, sbet, svp
 from HSTB.kluster import monitor, fqpr_actions
 from HSTB.kluster.fqpr_project import FqprProject
 from HSTB.kluster.fqpr_helpers import build_crs
-from HSTB.kluster.fqpr_vessel import compare_dict_data, convert_from_fqpr_xyzrph
+from HSTB.kluster.fqpr_vessel import compare_dict_data, convert_from_fqpr_xyzrph, copy_timestamped_data
 from HSTB.kluster import kluster_variables
 
 
@@ -594,14 +594,14 @@ class FqprIntel(LoggerClass):
                                 existing_data = new_xyzrph[entry][existing_tstmp]
                                 new_xyzrph[entry].pop(existing_tstmp)
                                 new_xyzrph[entry][new_tstmp] = existing_data
-                            new_data = deepcopy(new_xyzrph)
+                            new_data = copy_timestamped_data(new_xyzrph)
                         else:
                             print('WARNING: Unable to update with new waterline value, found multiple timestamped entries covering this dataset')
                     fqpr_instance.multibeam.xyzrph = new_xyzrph
                 else:  # ignore existing waterline values if we aren't overwriting using the vessel file
                     new_waterline = None
             elif fqpr_instance.multibeam.xyzrph:
-                new_data = deepcopy(fqpr_instance.multibeam.xyzrph)
+                new_data = copy_timestamped_data(fqpr_instance.multibeam.xyzrph)
 
             if new_data:
                 sonar_model = fqpr_instance.multibeam.raw_ping[0].sonartype
@@ -1,23 +1,44 @@
 import os
 import json
 from copy import deepcopy
+import numpy as np
 
 from HSTB.kluster import kluster_variables
 
+# set versions of the kluster_variables parameter name lists, for the per sensor membership checks below
+tpu_parameters = frozenset(kluster_variables.tpu_parameter_names)
+offset_parameters = frozenset(kluster_variables.offset_parameter_names)
+angle_parameters = frozenset(kluster_variables.angle_parameter_names)
+optional_parameters = frozenset(kluster_variables.optional_parameter_names)
+
 
 class VesselFile:
     """
     Class to manage the vessel configuration file (.kfc) for Kluster.  Holds the tpu parameters and lever arm information
     for each system in the project.  Stored in a nested dictionary that looks like this:
     serial number1: {sensor_name1: {utc timestamp1: value, utc timestamp2: value, ...}, ...
+
+    The sorted timestamps for each system are cached for return_data.  Setting data (or using open/update) clears the
+    cache, if you edit the data dictionary in place, call invalidate_timestamp_index afterwards.
     """
 
     def __init__(self, filepath: str = None):
+        # serial number: sorted int64 array of the timestamps for that system, see _timestamp_index
+        self._ts_index = {}
         self.data = {}
         self.source_file = ''
         if filepath:
             self.open(filepath)
 
+    @property
+    def data(self):
+        return self._data
+
+    @data.setter
+    def data(self, newdata: dict):
+        self._data = newdata
+        self.invalidate_timestamp_index()
+
     def open(self, filepath: str):
         """
         Open from a Vessel File json instance (vessel configuration file (.kfc))
@@ -61,11 +82,12 @@ class VesselFile:
 
         """
 
+        self.invalidate_timestamp_index(serial_number)
         if serial_number in self.data:
             identical_offsets, identical_angles, identical_tpu, data_matches, new_waterline = compare_dict_data(self.data[serial_number], data)
             if not identical_offsets or not identical_angles or not identical_tpu or new_waterline:
                 if carry_over_tpu:
-                    new_data = carry_over_optional(self.data[serial_number], deepcopy(data))
+                    new_data = carry_over_optional(self.data[serial_number], copy_timestamped_data(data))
                 else:
                     new_data = data
                 for entry in new_data.keys():
@@ -76,6 +98,43 @@ class VesselFile:
             print('Adding new entry in vessel file for {}'.format(serial_number))
             self.data[serial_number] = data
 
+    def invalidate_timestamp_index(self, serial_number: str = None):
+        """
+        Clear the cached sorted timestamps used by return_data.  Done for you when data is set or on open/update, call
+        this if you edit the data dictionary in place.
+
+        Parameters
+        ----------
+        serial_number
+            optional, system identifier to clear the cache for, if None will clear the cache for all systems
+        """
+
+        if serial_number is None:
+            self._ts_index = {}
+        else:
+            self._ts_index.pop(serial_number, None)
+
+    def _timestamp_index(self, serial_number: str):
+        """
+        Return the sorted timestamps for the given system, built from the first sensor entry and cached until the data
+        is set, the next open/update or invalidate_timestamp_index.
+
+        Parameters
+        ----------
+        serial_number
+            system identifier for the primary system (serial number of the sonar)
+
+        Returns
+        -------
+        np.ndarray
+            sorted int64 array of the utc timestamps for this system
+        """
+
+        if serial_number not in self._ts_index:
+            first_sensor = list(self.data[serial_number].keys())[0]
+            self._ts_index[serial_number] = np.sort(np.array([int(f) for f in self.data[serial_number][first_sensor].keys()], dtype=np.int64))
+        return self._ts_index[serial_number]
+
     def save(self, filepath: str = None):
         """
         Save the internal vessel file data to a json file
@@ -112,9 +171,7 @@ class VesselFile:
         """
         subset_data = {}
         if serial_number in self.data:
-            first_sensor = list(self.data[serial_number].keys())[0]
-            timestamps = [int(f) for f in list(self.data[serial_number][first_sensor].keys())]
-            final_timestamps = get_overlapping_timestamps(timestamps, starttime, endtime)
+            final_timestamps = get_overlapping_timestamps(self._timestamp_index(serial_number), starttime, endtime)
             if final_timestamps:
                 for entry in self.data[serial_number].keys():
                     subset_data[entry] = {}
@@ -168,24 +225,24 @@ def get_overlapping_timestamps(timestamps: list, starttime: int, endtime: int):
     """
 
     final_timestamps = []
+    tstmps = np.sort(np.asarray(timestamps, dtype=np.int64))
+    if not tstmps.size:
+        return final_timestamps
     # we require a starting time stamp that is either less than the given starttime or no greater than
     #   the given starttime by 60 seconds
     buffer = 60
-    starting_timestamp = None
-    for tstmp in timestamps:  # first pass, find the nearest timestamp (to starttime) without going over the starttime
-        if tstmp < starttime + buffer:
-            if not starting_timestamp:
-                starting_timestamp = tstmp
-            elif (tstmp > starting_timestamp) and (tstmp <= starttime):
-                starting_timestamp = tstmp
-    if starting_timestamp is None:
+    prior_index = np.searchsorted(tstmps, starttime, side='right') - 1
+    if prior_index >= 0:  # the nearest timestamp (to starttime) without going over the starttime
+        starting_timestamp = tstmps[prior_index]
+    elif tstmps[0] < starttime + buffer:
+        starting_timestamp = tstmps[0]
+    else:
         # raise ValueError('VesselFile: Found no overlapping timestamps for range {} -> {}, within the available timestamps: {}'.format(starttime, endtime, timestamps))
         return final_timestamps
-    starttime = starting_timestamp
-    final_timestamps.append(str(starttime))
-    for tstmp in timestamps:  # second pass, append all timestamps that are between the starting timestamp and endtime
-        if (tstmp > starttime) and (tstmp <= endtime):
-            final_timestamps.append(str(tstmp))
+    # all timestamps that are between the starting timestamp and endtime
+    startidx = np.searchsorted(tstmps, starting_timestamp, side='right')
+    endidx = np.searchsorted(tstmps, endtime, side='right')
+    final_timestamps = [str(tstmp) for tstmp in [starting_timestamp] + tstmps[startidx:endidx].tolist()]
     return final_timestamps
 
 
@@ -231,11 +288,11 @@ def compare_dict_data(dict_one: dict, dict_two: dict):
              'new_waterline': None}
     for sensor_one, data_one in dict_one.items():
         # only care about non-tpu differences
-        if sensor_one in kluster_variables.tpu_parameter_names:
+        if sensor_one in tpu_parameters:
             ky = 'identical_tpu'
-        elif sensor_one in kluster_variables.offset_parameter_names:
+        elif sensor_one in offset_parameters:
             ky = 'identical_offsets'
-        elif sensor_one in kluster_variables.angle_parameter_names:
+        elif sensor_one in angle_parameters:
             ky = 'identical_angles'
         elif sensor_one.lower() == 'waterline':
             ky = 'new_waterline'
@@ -243,21 +300,19 @@ def compare_dict_data(dict_one: dict, dict_two: dict):
             continue
         if sensor_one in dict_two:
             data_two = dict_two[sensor_one]
-            if check['identical_tpu'] or check['identical_offsets'] or check['identical_angles']:
+            # stop at the first difference, the check for this sensor type can only go from True to False
+            if (check['identical_tpu'] or check['identical_offsets'] or check['identical_angles']) and check[ky] is not False:
                 for tstmp, entry in data_one.items():
-                    if tstmp in data_two:
-                        if float(data_one[tstmp]) != float(data_two[tstmp]):
-                            check[ky] = False
-                    else:
+                    if tstmp not in data_two or float(entry) != float(data_two[tstmp]):
                         check[ky] = False
+                        break
             if check['data_matches']:
-                vals_one = [data_one[t] for t in [t for t in data_one.keys()]]
-                vals_two = [data_two[t] for t in [t for t in data_two.keys()]]
-                if vals_one != vals_two:
+                if list(data_one.values()) != list(data_two.values()):
                     check['data_matches'] = False
             if ky == 'new_waterline':
-                waterline_one = data_one[list(data_one.keys())[0]]
-                waterline_two = data_two[list(data_two.keys())[0]]
+                # first timestamp entry of each, without building the list of keys
+                waterline_one = data_one[next(iter(data_one))]
+                waterline_two = data_two[next(iter(data_two))]
                 if float(waterline_one) != float(waterline_two):
                     check['new_waterline'] = float(waterline_two)
         else:
@@ -267,6 +322,30 @@ def compare_dict_data(dict_one: dict, dict_two: dict):
     return check['identical_offsets'], check['identical_angles'], check['identical_tpu'], check['data_matches'], check['new_waterline']
 
 
+def copy_timestamped_data(data: dict):
+    """
+    Copy the timestamped data so that the copy can be altered without changing the original.  Expects data in the format
+
+    {sensor_name1: {utc timestamp1: value, utc timestamp2: value, ...},
+     sensor_name2: {utc timestamp1: value, utc timestamp2: value, ...}, ...}
+
+    where the values are json scalars (floats/strings), so copying the two dict levels is enough and much cheaper than
+    a deepcopy.  Any entry that is not a dict of timestamps is deep copied.
+
+    Parameters
+    ----------
+    data
+        dictionary of timestamped entries to copy
+
+    Returns
+    -------
+    dict
+        copy of data
+    """
+
+    return {sensor: dict(entries) if isinstance(entries, dict) else deepcopy(entries) for sensor, entries in data.items()}
+
+
 def carry_over_optional(starting_data: dict, new_data: dict):
     """
     Populate the optional and tpu parameters in the new data with the latest existing entry
@@ -289,7 +368,7 @@ def carry_over_optional(starting_data: dict, new_data: dict):
     first_new_entry = list(new_data.keys())[0]
     last_tstmp = str(max(starting_tstmps))
     for sensor in starting_data:
-        if (sensor in kluster_variables.tpu_parameter_names) or (sensor in kluster_variables.optional_parameter_names):
+        if (sensor in tpu_parameters) or (sensor in optional_parameters):
             if sensor not in new_data:
                 new_data[sensor] = {}
             for tstmp, val in new_data[first_new_entry].items():
@@ -317,19 +396,15 @@ def only_retain_earliest_entry(data: dict):
     """
 
     first_entry = list(data.keys())[0]
-    timestamps = [tstmp for tstmp in data[first_entry].keys()]
+    # build the values for each timestamp once, a timestamp is a duplicate if an earlier timestamp has the same values
+    earliest = {}
     remove_these = []
-    for primary_cnt, timestamp in enumerate(timestamps):
-        for secondary_cnt, sec_timestamp in enumerate(timestamps):
-            if primary_cnt == secondary_cnt or timestamp in remove_these or sec_timestamp in remove_these:
-                continue
-            prim_values = [data[entry][timestamp] for entry in data]
-            sec_values = [data[entry][sec_timestamp] for entry in data]
-            if prim_values == sec_values:
-                if int(timestamp) >= int(sec_timestamp):
-                    remove_these.append(timestamp)
-                else:
-                    remove_these.append(sec_timestamp)
+    for timestamp in sorted(data[first_entry].keys(), key=int):
+        values = tuple(data[entry][timestamp] for entry in data)
+        if values in earliest:
+            remove_these.append(timestamp)
+        else:
+            earliest[values] = timestamp
     if remove_these:
         for entry in data:
             for tstmp in remove_these:
@@ -358,7 +433,7 @@ def convert_from_fqpr_xyzrph(xyzrph: dict, sonar_model: str, system_identifier:
         converted xyzrph ready to be passed to VesselFile
     """
 
-    xyzrph = deepcopy(xyzrph)  # don't alter the original
+    xyzrph = copy_timestamped_data(xyzrph)  # don't alter the original
     first_sensor = list(xyzrph.keys())[0]
     tstmps = list(xyzrph[first_sensor].keys())
     vess_xyzrph = {str(system_identifier): xyzrph}
@@ -388,7 +463,7 @@ def convert_from_vessel_xyzrph(vess_xyzrph: dict):
     sonar_type = []
     source = []
     for sysident in system_identifiers:
-        xdata = deepcopy(vess_xyzrph[sysident])
+        xdata = copy_timestamped_data(vess_xyzrph[sysident])
         xyzrph.append(xdata)
         if 'sonar_type' in xdata:
             sonar_type.append(xdata.pop('sonar_type'))
@@ -3,67 +3,39 @@ matplotlib.use('qt5agg')
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
 from matplotlib import cm
 from matplotlib.figure import Figure
-from matplotlib.colors import ListedColormap
+from matplotlib.colors import ListedColormap, to_rgba_array
+from matplotlib.ticker import MaxNLocator
 
 import numpy as np
+from functools import lru_cache
 
 from HSTB.kluster.gui.backends._qt import QtGui, QtCore, QtWidgets, Signal, qgis_enabled, backend
 if qgis_enabled:
     from HSTB.kluster.gui.backends._qt import qgis_core, qgis_gui
 from HSTB.kluster import kluster_variables
+from HSTB.kluster.numba_helpers import rotate_xy, nan_min_max_mean, lut_colors
 
 from vispy import use, visuals, scene
 from vispy.util import keys
 use(backend, 'gl2')
 
 
+# border of the unit rectangle, (x, y) as multiples of the half width/half height, walking from the left edge midpoint
+#  through each corner and edge midpoint back to the start.  See rectangle_vertice
+rectangle_template = np.array([[-1, 0], [-1, -1], [0, -1], [1, -1], [1, 0], [1, 1], [0, 1], [-1, 1], [-1, 0]],
+                              dtype=np.float64)
+
+
 def rectangle_vertice(center, height, width):
     """
     See https://github.com/vispy/vispy/blob/64e76c40c8d7d38efc53c9a1a50ca7f336b9ffc2/examples/basics/scene/points_selection.py
     for source.  Build rectangle coordinates using the provided center, height, width
-    """
-
-    half_height = height / 2.
-    half_width = width / 2.
-
-    bias1 = np.ones(4) * half_width
-    bias2 = np.ones(4) * half_height
-
-    corner1 = np.empty([1, 3], dtype=np.float32)
-    corner2 = np.empty([1, 3], dtype=np.float32)
-    corner3 = np.empty([1, 3], dtype=np.float32)
-    corner4 = np.empty([1, 3], dtype=np.float32)
-
-    corner1[:, 0] = center[0] - bias1[0]
-    corner1[:, 1] = center[1] - bias2[0]
-    corner1[:, 2] = 0
-
-    corner2[:, 0] = center[0] + bias1[1]
-    corner2[:, 1] = center[1] - bias2[1]
-    corner2[:, 2] = 0
-
-    corner3[:, 0] = center[0] + bias1[2]
-    corner3[:, 1] = center[1] + bias2[2]
-    corner3[:, 2] = 0
 
-    corner4[:, 0] = center[0] - bias1[3]
-    corner4[:, 1] = center[1] + bias2[3]
-    corner4[:, 2] = 0
-
-    # Get vertices between each corner of the rectangle for border drawing
-    vertices = np.concatenate(([[center[0], center[1], 0.]],
-                               [[center[0] - half_width, center[1], 0.]],
-                               corner1,
-                               [[center[0], center[1] - half_height, 0.]],
-                               corner2,
-                               [[center[0] + half_width, center[1], 0.]],
-                               corner3,
-                               [[center[0], center[1] + half_height, 0.]],
-                               corner4,
-                               [[center[0] - half_width, center[1], 0.]]))
+    Vertices between each corner of the rectangle (for border drawing) are built in one go by scaling the unit
+    rectangle_template and shifting it to the center.
+    """
 
-    # vertices = np.array(output, dtype=np.float32)
-    return vertices[1:, ..., :2]
+    return rectangle_template * (width / 2., height / 2.) + (center[0], center[1])
 
 
 class ScaleAxisWidget(scene.AxisWidget):
@@ -71,10 +43,25 @@ class ScaleAxisWidget(scene.AxisWidget):
         super().__init__(**kwargs)
         self.unfreeze()
         self.add_factor = add_factor
+        # single shot, zero interval timer, fires once the qt event loop is free.  Used to coalesce all the transform
+        #  changes from a mouse drag into a single axis update
+        self._update_timer = QtCore.QTimer()
+        self._update_timer.setSingleShot(True)
+        self._update_timer.setInterval(0)
+        self._update_timer.timeout.connect(self._update_domain)
 
     def _view_changed(self, event=None):
-        """Linked view transform has changed; update ticks.
+        """Linked view transform has changed; schedule an update of the ticks.
+        """
+        if not self._update_timer.isActive():
+            self._update_timer.start()
+
+    def _update_domain(self):
         """
+        Update the axis domain (and so the ticks) to match the linked view, offset by the add_factor
+        """
+        if self._linked_view is None or self.parent is None:  # axis was removed before the update fired
+            return
         tr = self.node_transform(self._linked_view.scene)
         p1, p2 = tr.map(self._axis_ends())
         if self.orientation in ('left', 'right'):
@@ -98,6 +85,12 @@ class ColorBar(FigureCanvasQTAgg):
         self.c_map_ax.get_yaxis().set_visible(False)
         # self.fig.set_facecolor('black')
 
+        # the last built colorbar, reused if the colormap/labels are the same and only the range changes
+        self._colorbar = None
+        self._scalar_mappable = None
+        self._colorbar_key = None
+        self._colorbar_range = None
+
     def setup_colorbar(self, cmap: matplotlib.colors.Colormap, minval: float, maxval: float, is_rejected: bool = False,
                        by_name: list = None, invert_y: bool = False):
         """
@@ -120,29 +113,163 @@ class ColorBar(FigureCanvasQTAgg):
             invert the y axis
         """
 
+        norm = matplotlib.colors.Normalize(vmin=minval, vmax=maxval)
+        colorbar_key = (cmap.name, cmap.N, is_rejected, tuple(by_name) if by_name else None, invert_y)
+        if self._colorbar is not None and colorbar_key == self._colorbar_key:
+            if (minval, maxval) == self._colorbar_range:  # nothing has changed
+                return
+            # same colormap, just update the range of the existing colorbar instead of rebuilding it.  Only for the
+            #  plain colorbar, updating the norm resets the custom ticks used with rejected/by_name
+            if not is_rejected and not by_name:
+                self._scalar_mappable.set_norm(norm)
+                self._colorbar.update_normal(self._scalar_mappable)
+                if invert_y and not self.c_map_ax.yaxis_inverted():
+                    self.c_map_ax.invert_yaxis()
+                self._colorbar_range = (minval, maxval)
+                self.draw_idle()
+                return
+
         self.c_map_ax.get_xaxis().set_visible(True)
         self.c_map_ax.get_yaxis().set_visible(True)
         self.c_map_ax.clear()
-        norm = matplotlib.colors.Normalize(vmin=minval, vmax=maxval)
+        self._scalar_mappable = cm.ScalarMappable(norm=norm, cmap=cmap)
+        self._colorbar = None
         if is_rejected:
-            self.fig.colorbar(cm.ScalarMappable(norm=norm, cmap=cmap), orientation='vertical', cax=self.c_map_ax,
-                              ticks=[3, 2, 1, 0])
+            self._colorbar = self.fig.colorbar(self._scalar_mappable, orientation='vertical', cax=self.c_map_ax,
+                                               ticks=[3, 2, 1, 0])
             self.c_map_ax.set_yticklabels(['Re-Accept', 'Reject', 'Phase', 'Amplitude'])
             self.c_map_ax.tick_params(labelsize=8)
         elif by_name:
-            self.fig.colorbar(cm.ScalarMappable(norm=norm, cmap=cmap), orientation='vertical', cax=self.c_map_ax,
-                              ticks=(np.arange(len(by_name)) + 0.5).tolist())
+            self._colorbar = self.fig.colorbar(self._scalar_mappable, orientation='vertical', cax=self.c_map_ax,
+                                               ticks=(np.arange(len(by_name)) + 0.5).tolist())
             self.c_map_ax.set_yticklabels(by_name)
             self.c_map_ax.tick_params(labelsize=7)
         else:
             try:
-                self.fig.colorbar(cm.ScalarMappable(norm=norm, cmap=cmap), orientation='vertical', cax=self.c_map_ax)
+                self._colorbar = self.fig.colorbar(self._scalar_mappable, orientation='vertical', cax=self.c_map_ax)
                 self.c_map_ax.tick_params(labelsize=9)
             except IndexError:  # some colorbars like 'system' can rely on data that might not be loaded on starting Kluster
                 pass
         if invert_y:
             self.c_map_ax.invert_yaxis()
-        self.draw()
+        self._colorbar_key = colorbar_key
+        self._colorbar_range = (minval, maxval)
+        self.draw_idle()
+
+    def set_facecolor(self, color: str):
+        """
+        Set the background color of the colorbar figure, ex: 'black' for dark mode
+        """
+
+        self.fig.set_facecolor(color)
+        self.draw_idle()
+
+
+class QColorBar(QtWidgets.QWidget):
+    """
+    Lightweight version of ColorBar that paints the colorbar with QPainter instead of rendering a matplotlib figure.
+    Takes the same arguments in setup_colorbar, the colormap is sampled once per setup and Qt handles the redraws.  Use
+    ColorBar if you need the colorbar to match the matplotlib rendering exactly.
+    """
+    def __init__(self, parent=None, width: int = 110):
+        super().__init__(parent)
+        self.setMinimumWidth(width)
+        self.facecolor = QtGui.QColor('white')
+        self.textcolor = QtGui.QColor('black')
+        # list of [position along the bar (0 = bottom, 1 = top), QColor] for the gradient
+        self._stops = []
+        # list of [position along the bar (0 = bottom, 1 = top), tick label]
+        self._ticks = []
+        self._labelsize = 9
+
+    def setup_colorbar(self, cmap: matplotlib.colors.Colormap, minval: float, maxval: float, is_rejected: bool = False,
+                       by_name: list = None, invert_y: bool = False):
+        """
+        Provide a color map and a min max value to build the colorbar
+
+        Parameters
+        ----------
+        cmap
+            provide a colormap to use for the color bar
+        minval
+            min value of the color bar
+        maxval
+            max value of the color bar
+        is_rejected
+            if is rejected, set the custom tick labels
+        by_name
+            if this is populated, we will show the colorbar with ticks equal to the length of the list and labels equal
+            to the list
+        invert_y
+            invert the y axis
+        """
+
+        # one hard edged band for each color in the colormap, same as the matplotlib colorbar of a resampled colormap
+        bands = cmap(np.arange(cmap.N), bytes=True)
+        stops = []
+        for cnt, (r, g, b, a) in enumerate(bands.tolist()):
+            clr = QtGui.QColor(r, g, b, a)
+            stops.append([cnt / cmap.N, clr])
+            stops.append([max((cnt + 1) / cmap.N - 1e-6, 0), clr])
+
+        if is_rejected:
+            ticks = [[0, 'Amplitude'], [1, 'Phase'], [2, 'Reject'], [3, 'Re-Accept']]
+            self._labelsize = 8
+        elif by_name:
+            ticks = [[cnt + 0.5, nm] for cnt, nm in enumerate(by_name)]
+            self._labelsize = 7
+        else:
+            ticks = [[tck, '{:g}'.format(tck)] for tck in MaxNLocator(nbins=8).tick_values(minval, maxval)]
+            self._labelsize = 9
+        valrange = maxval - minval
+        if valrange:
+            ticks = [[(tck - minval) / valrange, lbl] for tck, lbl in ticks if minval <= tck <= maxval]
+        else:
+            ticks = []
+
+        if invert_y:
+            stops = [[1 - pos, clr] for pos, clr in stops]
+            ticks = [[1 - pos, lbl] for pos, lbl in ticks]
+        self._stops = stops
+        self._ticks = ticks
+        self.update()
+
+    def set_facecolor(self, color: str):
+        """
+        Set the background color of the colorbar, ex: 'black' for dark mode.  Text is drawn in the inverse color
+        """
+
+        self.facecolor = QtGui.QColor(color)
+        self.textcolor = QtGui.QColor(255 - self.facecolor.red(), 255 - self.facecolor.green(), 255 - self.facecolor.blue())
+        self.update()
+
+    def paintEvent(self, event):
+        """
+        Paint the gradient bar, outline, ticks and tick labels.  Bar takes the same space in the widget as the
+        matplotlib ColorBar axes.
+        """
+
+        painter = QtGui.QPainter(self)
+        painter.fillRect(self.rect(), self.facecolor)
+        if self._stops:
+            width, height = self.width(), self.height()
+            bar = QtCore.QRectF(0.05 * width, 0.05 * height, 0.25 * width, 0.9 * height)
+            gradient = QtGui.QLinearGradient(bar.bottomLeft(), bar.topLeft())
+            for pos, clr in self._stops:
+                gradient.setColorAt(pos, clr)
+            painter.fillRect(bar, QtGui.QBrush(gradient))
+
+            painter.setPen(self.textcolor)
+            painter.drawRect(bar)
+            font = painter.font()
+            font.setPointSize(self._labelsize)
+            painter.setFont(font)
+            text_offset = painter.fontMetrics().ascent() / 3
+            for pos, lbl in self._ticks:
+                ypos = bar.bottom() - pos * bar.height()
+                painter.drawLine(QtCore.QPointF(bar.right(), ypos), QtCore.QPointF(bar.right() + 4, ypos))
+                painter.drawText(QtCore.QPointF(bar.right() + 7, ypos + text_offset), lbl)
+        painter.end()
 
 
 class DockableCanvas(scene.SceneCanvas):
@@ -202,10 +329,11 @@ class PanZoomInteractive(scene.PanZoomCamera):
         Set the scale and center according to the new zoom.  Triggered on moving the mouse with right click.
         """
 
-        p1c = np.array(event.last_event.pos)[:2]
-        p2c = np.array(event.pos)[:2]
-        scale = ((1 + self.zoom_factor) ** ((p1c - p2c) *
-                                            np.array([1, -1])))
+        # two element positions, scalar math is quicker than building numpy arrays on every mouse move
+        p1c = event.last_event.pos
+        p2c = event.pos
+        zoom_base = 1 + self.zoom_factor
+        scale = (zoom_base ** (p1c[0] - p2c[0]), zoom_base ** (p2c[1] - p1c[1]))
         center = self._transform.imap(event.press_event.pos[:2])
         self.zoom(scale, center)
         self.fresh_camera = False
@@ -215,10 +343,8 @@ class PanZoomInteractive(scene.PanZoomCamera):
         Move the camera center according event pos, last pos.  This is called when dragging the mouse in translate
         mode.
         """
-        p1 = np.array(event.last_event.pos)[:2]
-        p2 = np.array(event.pos)[:2]
-        p1s = self._transform.imap(p1)
-        p2s = self._transform.imap(p2)
+        p1s = self._transform.imap(event.last_event.pos[:2])
+        p2s = self._transform.imap(event.pos[:2])
         self.pan(p1s - p2s)
         self.fresh_camera = False
 
@@ -379,6 +505,9 @@ class TurntableCameraInteractive(scene.TurntableCamera):
         self.accept_callback = None
         self.undo_callback = None
         self.fresh_camera = True
+        # (roll, azimuth, elevation) the cached (rotation matrix, inverse rotation matrix) were built for
+        self._rotation_key = None
+        self._rotation_mats = None
 
     def _bind_event(self, selfunc, eventname):
         """
@@ -397,35 +526,50 @@ class TurntableCameraInteractive(scene.TurntableCamera):
             raise NotImplementedError(
                 'Only select, clean, accept and undo functions currently supported, received {}'.format(eventname))
 
+    def _rotation_matrix(self, inv: bool = False):
+        """
+        Build the 3x3 matrix that rotates vector coordinates to camera roll, azimuth, elevation.  Matrices are cached
+        and only rebuilt when the camera roll/azimuth/elevation changes.
+
+        Parameters
+        ----------
+        inv
+            if True, returns the matrix that rotates from already rotated data coordinates to pixel camera coordinates
+
+        Returns
+        -------
+        np.ndarray
+            (3,3) rotation matrix
+        """
+
+        key = (self.roll, self.azimuth, self.elevation)
+        if self._rotation_key != key:
+            # modeled after the _dist_to_trans method, appears to be some kind of almost YXZ tait-bryan standard.  I
+            # can't seem to replicate this using scipy rotation
+            rae = np.array(key) * np.pi / 180
+            sro, saz, sel = np.sin(rae)
+            cro, caz, cel = np.cos(rae)
+            rotmat = np.array([[cro * caz + sro * sel * saz, sro * caz - cro * sel * saz, cel * saz],
+                               [cro * saz - sro * sel * caz, sro * saz + cro * sel * caz, cel * caz],
+                               [-sro * cel, cro * cel, sel]])
+            # the inverse shares all the same terms, it is just the transpose of the rotation matrix
+            self._rotation_mats = (rotmat, rotmat.T.copy())
+            self._rotation_key = key
+        return self._rotation_mats[int(inv)]
+
     def _3drot_vector(self, x, y, z, inv: bool = False):
         """
         Rotate the provided vector coordinates to camera roll, azimuth, elevation
         """
-        # modeled after the _dist_to_trans method, appears to be some kind of almost YXZ tait-bryan standard.  I can't
-        # seem to replicate this using scipy rotation
-        rae = np.array([self.roll, self.azimuth, self.elevation]) * np.pi / 180
-        sro, saz, sel = np.sin(rae)
-        cro, caz, cel = np.cos(rae)
-        if not inv:
-            dx = (+ x * (cro * caz + sro * sel * saz)
-                  + y * (sro * caz - cro * sel * saz)
-                  + z * (cel * saz))
-            dy = (+ x * (cro * saz - sro * sel * caz)
-                  + y * (sro * saz + cro * sel * caz)
-                  + z * (cel * caz))
-            dz = (- x * (sro * cel)
-                  + y * (cro * cel)
-                  + z * sel)
-        else:  # this rotates from already rotated data coordinates to pixel camera coordinates
-            dx = (+ x * (cro * caz + sro * sel * saz)
-                  + y * (cro * saz - sro * sel * caz)
-                  - z * (sro * cel))
-            dy = (+ x * (sro * caz - cro * sel * saz)
-                  + y * (sro * saz + cro * sel * caz)
-                  + z * (cro * cel))
-            dz = (+ x * (cel * saz)
-                  + y * (cel * caz)
-                  + z * sel)
+
+        rotmat = self._rotation_matrix(inv)
+        if np.ndim(x) == 0 and np.ndim(y) == 0 and np.ndim(z) == 0:
+            # scalar coordinates (i.e. from mouse events), skip building arrays
+            dx = rotmat[0, 0] * x + rotmat[0, 1] * y + rotmat[0, 2] * z
+            dy = rotmat[1, 0] * x + rotmat[1, 1] * y + rotmat[1, 2] * z
+            dz = rotmat[2, 0] * x + rotmat[2, 1] * y + rotmat[2, 2] * z
+            return dx, dy, dz
+        dx, dy, dz = rotmat @ np.stack(np.broadcast_arrays(x, y, z))
         return dx, dy, dz
 
     def _dist_between_mouse_coords(self, start_pos: np.array, end_pos: np.array):
@@ -442,12 +586,15 @@ class TurntableCameraInteractive(scene.TurntableCamera):
 
         Returns
         -------
-        np.array
+        tuple
             (x distance, y distance)
         """
 
-        dist = (start_pos - end_pos) / self._viewbox.size * self.distance
-        return dist
+        # two element positions, plain scalar math beats numpy dispatch here
+        viewbox_size = self._viewbox.size
+        distance = self.distance
+        return ((start_pos[0] - end_pos[0]) / viewbox_size[0] * distance,
+                (start_pos[1] - end_pos[1]) / viewbox_size[1] * distance)
 
     def _handle_translate_event(self, start_pos, end_pos):
         """
@@ -465,12 +612,11 @@ class TurntableCameraInteractive(scene.TurntableCamera):
         if self._event_value is None or len(self._event_value) == 2:
             self._event_value = self.center
         dist = self._dist_between_mouse_coords(start_pos, end_pos)
-        dist[1] *= -1
-        dx, dy, dz = self._3drot_vector(dist[0], dist[1], 0)
-        # Black magic part 2: take up-vector and flipping into account
+        # Black magic part 2: take up-vector and flipping into account.  Rotating the (x, -y, 0) screen distance and
+        # then projecting onto the right/forward/up vectors is done as one matrix product
         ff = self._flip_factors
         up, forward, right = self._get_dim_vectors()
-        dx, dy, dz = right * dx + forward * dy + up * dz
+        dx, dy, dz = np.column_stack((right, forward, up)) @ (self._rotation_matrix()[:, :2] @ (dist[0], -dist[1]))
         dx, dy, dz = ff[0] * dx, ff[1] * dy, dz * ff[2]
         c = self._event_value
         self.center = c[0] + dx, c[1] + dy, c[2] + dz
@@ -623,6 +769,57 @@ class TurntableCameraInteractive(scene.TurntableCamera):
             event.handled = False
 
 
+# dtype of each point attribute stored in the ThreeDView, incoming data is cast to these on add_points.  Eastings and
+#  northings (and the rotated rotx/roty) are stored as float32 offsets from a float64 origin, float32 can't resolve the
+#  projected coordinates themselves to better than about half a meter, but is good to a few millimeters within tens of
+#  kilometers of the origin.  id and linename are category attributes, stored as codes into a lookup list of names, see
+#  ThreeDView.decode_category
+point_dtypes = {'id': np.int32, 'head': np.uint8, 'x': np.float32, 'y': np.float32, 'z': np.float32, 'rotx': np.float32,
+                'roty': np.float32, 'tvu': np.float32, 'rejected': np.uint8, 'pointtime': np.float64, 'beam': np.uint16,
+                'linename': np.int32}
+category_fields = ('id', 'linename')
+# shared zero length buffers for an empty ThreeDView, nothing can be written to these, add_points always grows first
+empty_point_fields = {fld: np.empty(0, dtype=dtyp) for fld, dtyp in point_dtypes.items()}
+# colors for each rejected flag value (0, 1, 2, 3), used to color the points directly by flag value
+rejected_colormap = ListedColormap(['white', 'blue', 'red', 'cyan'])
+rejected_lut = to_rgba_array(rejected_colormap.colors).astype(np.float32)
+rejected_lut.flags.writeable = False
+
+
+def _point_field(fieldname: str):
+    """
+    Build a read only property that returns the populated part of the ThreeDView point buffer for fieldname.  Returns a
+    view, so in place edits (i.e. setting the rejected flag) are written to the buffer.
+    """
+
+    def getter(self):
+        return self._fields[fieldname][:self._point_count]
+    return property(getter)
+
+
+def _origin_field(fieldname: str, origin_index: int):
+    """
+    Build a read only property that returns the full float64 coordinate for the ThreeDView offset attribute fieldname
+    (stored as float32 offsets from the point origin, see point_dtypes).  Builds a new array, use the local properties
+    (x_local, y_local) where you can.
+    """
+
+    def getter(self):
+        return np.add(self._fields[fieldname][:self._point_count], self._xy_origin[origin_index], dtype=np.float64)
+    return property(getter)
+
+
+def _category_field(fieldname: str):
+    """
+    Build a read only property that returns the names for the ThreeDView category attribute fieldname (i.e. the system
+    id for each point).  Builds a new object array, use the code properties (id_code, linename_code) where you can.
+    """
+
+    def getter(self):
+        return self.decode_category(fieldname)
+    return property(getter)
+
+
 class ThreeDView(QtWidgets.QWidget):
     """
     Widget containing the Vispy scene.  Controlled with mouse (rotation/translation) and dictated by the values
@@ -634,8 +831,8 @@ class ThreeDView(QtWidgets.QWidget):
         self.canvas = DockableCanvas(keys='interactive', show=True, parent=parent)
         self.view = self.canvas.central_widget.add_view()
         self.axis_x = None
-        self.axis_y = None
         self.axis_z = None
+        self.axis_3d = None
         self.twod_grid = None
         # self.axis_labels = None
 
@@ -649,20 +846,13 @@ class ThreeDView(QtWidgets.QWidget):
         self.idrange = {}
         self.idlookup = {}
 
-        self.id = np.array([], dtype=object)
-        self.head = np.array([], dtype=np.int8)
-        self.x = np.array([], dtype=np.float64)
-        self.y = np.array([], dtype=np.float64)
-        self.z = np.array([], dtype=np.float32)
-        self.rotx = np.array([], dtype=np.float64)
-        self.roty = np.array([], dtype=np.float64)
-        self.tvu = np.array([], dtype=np.float32)
-        self.rejected = np.array([], dtype=np.int32)
-        self.pointtime = np.array([], dtype=np.float64)
-        self.beam = np.array([], dtype=np.int32)
-        self.linename = np.array([], dtype=object)
-
-        # statistics are populated on display_points
+        # point data is held in growable buffers, one per attribute, see _allocate_points
+        self._point_count = 0
+        self._point_capacity = 0
+        self._fields = {}
+        self._allocate_points()
+
+        # statistics are populated on display_points, the x/y statistics and offsets are relative to the point origin
         self.x_offset = 0.0
         self.y_offset = 0.0
         self.z_offset = 0.0
@@ -686,6 +876,9 @@ class ThreeDView(QtWidgets.QWidget):
         self.mean_beam = 0
         self.unique_systems = []
         self.unique_linenames = []
+        # index into unique_systems/unique_linenames for each point
+        self._system_idx = None
+        self._linename_idx = None
 
         self.vertical_exaggeration = 1.0
         self.view_direction = 'north'
@@ -693,8 +886,18 @@ class ThreeDView(QtWidgets.QWidget):
         self.show_rejected = True
 
         self.displayed_points = None
+        # (N,3) float32 buffer that displayed_points is built in, kept around to reuse on the next display_points
+        self._displayed_buf = None
         self.selected_points = None
         self.superselected_index = None
+        # RGBA encoded point ids used for picking points in 3d, see _build_color_by_soundings
+        self._id_colors = None
+        # reused buffer for the not rejected mask, see _not_rejected_mask
+        self._scratch_mask = None
+        # show_rejected and the shown points mask (None if showing all points) at the last scatter set_data, the
+        #  positions on the GPU are only valid for the color only update while these match, see _set_scatter_colors
+        self._scatter_show_rejected = None
+        self._scatter_shown_mask = None
 
         layout = QtWidgets.QHBoxLayout()
         layout.addWidget(self.canvas.native)
@@ -711,6 +914,23 @@ class ThreeDView(QtWidgets.QWidget):
         self.line = scene.visuals.Line(color=self.select_rect_color, method='gl', parent=self.canvas.scene)
         self.line.visible = False  # set initially to invisible so it doesn't block the initial camera event
 
+    id = _category_field('id')
+    id_code = _point_field('id')
+    head = _point_field('head')
+    x = _origin_field('x', 0)
+    y = _origin_field('y', 1)
+    x_local = _point_field('x')
+    y_local = _point_field('y')
+    z = _point_field('z')
+    rotx = _point_field('rotx')
+    roty = _point_field('roty')
+    tvu = _point_field('tvu')
+    rejected = _point_field('rejected')
+    pointtime = _point_field('pointtime')
+    beam = _point_field('beam')
+    linename = _category_field('linename')
+    linename_code = _point_field('linename')
+
     @property
     def select_rect_color(self):
         return self._select_rect_color
@@ -720,6 +940,49 @@ class ThreeDView(QtWidgets.QWidget):
         self._select_rect_color = clr
         self.line._color = clr
 
+    def _allocate_points(self, capacity: int = 0):
+        """
+        Build new (empty) point buffers, one for each attribute in point_dtypes.  Any existing point data is dropped.
+
+        Parameters
+        ----------
+        capacity
+            number of points to allocate space for
+        """
+
+        self._point_count = 0
+        self._point_capacity = capacity
+        # x/y are stored relative to this origin, set on the first add_points
+        self._xy_origin = (0.0, 0.0)
+        if capacity:
+            self._fields = {fld: np.empty(capacity, dtype=dtyp) for fld, dtyp in point_dtypes.items()}
+        else:
+            self._fields = dict(empty_point_fields)
+        self._category_names = {fld: [] for fld in category_fields}
+        self._category_codes = {fld: {} for fld in category_fields}
+
+    def _grow_points(self, count: int, exact: bool = False):
+        """
+        Make sure the point buffers have room for count more points.  Buffers grow by doubling, so that repeated calls
+        to add_points only copy the existing data a handful of times instead of on every call.
+
+        Parameters
+        ----------
+        count
+            number of points about to be added
+        exact
+            if True, grow the buffers to exactly the needed size instead of doubling
+        """
+
+        needed = self._point_count + count
+        if needed > self._point_capacity:
+            newcapacity = needed if exact else max(2 * self._point_capacity, needed)
+            for fld, arr in self._fields.items():
+                newarr = np.empty(newcapacity, dtype=arr.dtype)
+                newarr[:self._point_count] = arr[:self._point_count]
+                self._fields[fld] = newarr
+            self._point_capacity = newcapacity
+
     def _on_mouse_press(self, event):
         """
         Capture the mouse event before the camera gets it for point selection/cleaning to set the origin of the drawn
@@ -750,7 +1013,7 @@ class ThreeDView(QtWidgets.QWidget):
                 height = event.pos[1] - self.line_origin[1]
                 center = (width / 2. + self.line_origin[0], height / 2. + self.line_origin[1], 0)
                 self.line_pos = rectangle_vertice(center, height, width)
-                self.line.set_data(np.array(self.line_pos))
+                self.line.set_data(self.line_pos)
 
     def _select_points(self, startpos, endpos, three_d: bool = False):
         """
@@ -805,6 +1068,91 @@ class ThreeDView(QtWidgets.QWidget):
         if self.displayed_points is not None and self.parent is not None:
             self.parent.undo_clean()
 
+    def _category_code(self, fieldname: str, name: str):
+        """
+        Return the integer code for name in the category attribute fieldname, adding it to the lookup if it is new
+
+        Parameters
+        ----------
+        fieldname
+            one of category_fields
+        name
+            name to encode, ex: 'EM710_234_02_10_2019_0'
+
+        Returns
+        -------
+        int
+            code for name
+        """
+
+        codes = self._category_codes[fieldname]
+        if name not in codes:
+            codes[name] = len(self._category_names[fieldname])
+            self._category_names[fieldname].append(name)
+        return codes[name]
+
+    def decode_category(self, fieldname: str, index=None):
+        """
+        Return the names for the category attribute fieldname, optionally only for the points at index
+
+        Parameters
+        ----------
+        fieldname
+            one of category_fields
+        index
+            optional, anything that can index a numpy array (i.e. the selected points index)
+
+        Returns
+        -------
+        np.ndarray
+            object array of names
+        """
+
+        codes = self._fields[fieldname][:self._point_count]
+        if index is not None:
+            codes = codes[index]
+        return np.array(self._category_names[fieldname], dtype=object)[codes]
+
+    def unique_category(self, fieldname: str):
+        """
+        Return the sorted unique names for the category attribute fieldname, along with the index into those names
+        for each point.  Equivalent to np.unique(names, return_inverse=True), but works on the integer codes so that
+        we never have to compare strings across all the points.
+
+        Parameters
+        ----------
+        fieldname
+            one of category_fields
+
+        Returns
+        -------
+        list
+            sorted list of the unique names
+        np.ndarray
+            int32 array, index into the unique names for each point
+        """
+
+        codes = self._fields[fieldname][:self._point_count]
+        allnames = self._category_names[fieldname]
+        present = np.flatnonzero(np.bincount(codes, minlength=len(allnames)))
+        present = sorted(present.tolist(), key=lambda cde: allnames[cde])
+        code_to_idx = np.zeros(len(allnames), dtype=np.int32)
+        code_to_idx[present] = np.arange(len(present), dtype=np.int32)
+        return [allnames[cde] for cde in present], code_to_idx[codes]
+
+    def reserve_points(self, count: int):
+        """
+        Allocate room for count more points.  If you know how many points you are going to add over several add_points
+        calls, reserving them first means each point is only copied into the buffers once.
+
+        Parameters
+        ----------
+        count
+            number of points that will be added
+        """
+
+        self._grow_points(count, exact=True)
+
     def add_points(self, head: np.array, x: np.array, y: np.array, z: np.array, tvu: np.array, rejected: np.array,
                    pointtime: np.array, beam: np.array, newid: str, linename: np.array, azimuth: float = None):
         """
@@ -836,43 +1184,57 @@ class ThreeDView(QtWidgets.QWidget):
             azimuth of the selection polygon in radians
         """
 
+        if not x.shape[0]:
+            return
+        start = self._point_count
+        end = start + x.shape[0]
+        self._grow_points(x.shape[0])
+
+        if not start:
+            self._xy_origin = (float(np.nan_to_num(np.nanmin(x))), float(np.nan_to_num(np.nanmin(y))))
+        # subtract the origin at full precision, then store the (small) offsets as float32
+        xlocal = self._fields['x'][start:end]
+        ylocal = self._fields['y'][start:end]
+        np.subtract(x, self._xy_origin[0], out=xlocal, casting='unsafe')
+        np.subtract(y, self._xy_origin[1], out=ylocal, casting='unsafe')
         if azimuth:
-            cos_az = np.cos(azimuth)
-            sin_az = np.sin(azimuth)
-
-            rotx = cos_az * x - sin_az * y
-            roty = sin_az * x + cos_az * y
-            self.rotx = np.concatenate([self.rotx, rotx])
-            self.roty = np.concatenate([self.roty, roty])
+            # rotate straight into the point buffers, one pass over x/y and no temporary arrays
+            rotate_xy(xlocal, ylocal, np.cos(azimuth), np.sin(azimuth), self._fields['rotx'][start:end],
+                      self._fields['roty'][start:end])
         else:
-            self.rotx = np.concatenate([self.rotx, x])
-            self.roty = np.concatenate([self.roty, y])
+            self._fields['rotx'][start:end] = xlocal
+            self._fields['roty'][start:end] = ylocal
 
-        self.head = np.concatenate([self.head, head])
+        self._fields['head'][start:end] = head
 
-        # expand the identifier to be the size of the input arrays
-        newid_array = np.full(head.shape[0], newid, dtype=object) + '_' + head.astype(str)
-        self.id = np.concatenate([self.id, newid_array])
-        uniqids = np.unique(newid_array)
-        for unid in uniqids:
-            headnum = int(unid[-1])
+        # the identifier is the container name plus the head index, stored as a code for each unique identifier
+        uniqheads = np.unique(head)
+        head_to_code = np.zeros(int(uniqheads[-1]) + 1, dtype=np.int32)
+        for headnum in uniqheads:
+            unid = '{}_{}'.format(newid, headnum)
+            head_to_code[headnum] = self._category_code('id', unid)
             self.idlookup[unid] = newid
             headwhere = np.where(head == headnum)[0]
             headstart, headend = headwhere[0], headwhere[-1] + 1
-            self.idrange[unid] = [self.x.shape[0] + headstart, self.x.shape[0] + headend]
-
-        self.x = np.concatenate([self.x, x])
-        self.y = np.concatenate([self.y, y])
-        self.z = np.concatenate([self.z, z])
-        self.tvu = np.concatenate([self.tvu, tvu])
-        self.rejected = np.concatenate([self.rejected, rejected])
-        self.pointtime = np.concatenate([self.pointtime, pointtime])
-        self.beam = np.concatenate([self.beam, beam])
-        self.linename = np.concatenate([self.linename, linename])
+            self.idrange[unid] = [start + headstart, start + headend]
+        # gather the codes straight into the buffer, no per point temporary.  mode=clip as mode=raise buffers the output
+        np.take(head_to_code, head, out=self._fields['id'][start:end], mode='clip')
+
+        self._fields['z'][start:end] = z
+        self._fields['tvu'][start:end] = tvu
+        self._fields['rejected'][start:end] = rejected
+        self._fields['pointtime'][start:end] = pointtime
+        self._fields['beam'][start:end] = beam
+        uniqlines, line_index = np.unique(linename, return_inverse=True)
+        line_to_code = np.array([self._category_code('linename', ln) for ln in uniqlines.tolist()], dtype=np.int32)
+        np.take(line_to_code, line_index.ravel(), out=self._fields['linename'][start:end], mode='clip')
+        self._point_count = end
 
     def return_points(self):
         """
-        Return all the data in the 3dview
+        Return all the data in the 3dview.  head, z, tvu, rejected, pointtime and beam are views into the point buffers,
+        so in place edits are written to the view.  id, x, y and linename are new arrays (decoded from the category
+        codes and built from the float32 offsets + origin respectively), editing these does not change the view.
         """
         return [self.id, self.head, self.x, self.y, self.z, self.tvu, self.rejected, self.pointtime, self.beam, self.linename]
 
@@ -882,15 +1244,7 @@ class ThreeDView(QtWidgets.QWidget):
         have to rebuild the view for each mode
         """
 
-        if self.axis_x is not None:
-            self.axis_x.parent = None
-            self.axis_x = None
-        if self.axis_y is not None:
-            self.axis_y.parent = None
-            self.axis_y = None
-        if self.axis_z is not None:
-            self.axis_z.parent = None
-            self.axis_z = None
+        self._clear_axes()
         if self.is_3d:
             if self.twod_grid:
                 self.canvas.central_widget.remove_widget(self.twod_grid)
@@ -909,21 +1263,24 @@ class ThreeDView(QtWidgets.QWidget):
         self.view.camera._bind_event(self._accept_points, 'accept')
         self.view.camera._bind_event(self._undo_clean, 'undo')
 
+    def _clear_axes(self):
+        """
+        Remove the axes built in setup_axes from the scene.  Setting the parent of a visual to None deletes it
+        """
+
+        for axis_name in ['axis_x', 'axis_z', 'axis_3d']:
+            axis = getattr(self, axis_name)
+            if axis is not None:
+                axis.parent = None
+                setattr(self, axis_name, None)
+
     def setup_axes(self):
         """
         Build the axes to match the scatter data loaded.  I use the axiswidget for 2d view, doesn't seem to work
         for 3d view.  I really like the ticks though.  I need something more sophisticated for 3d view.
         """
 
-        if self.axis_x is not None:
-            self.axis_x.parent = None
-            self.axis_x = None
-        if self.axis_y is not None:
-            self.axis_y.parent = None
-            self.axis_y = None
-        if self.axis_z is not None:
-            self.axis_z.parent = None
-            self.axis_z = None
+        self._clear_axes()
 
         if self.show_axis:
             if self.is_3d:  # just using arrows for now, nothing that cool
@@ -931,17 +1288,18 @@ class ThreeDView(QtWidgets.QWidget):
                     self.canvas.central_widget.remove_widget(self.twod_grid)
                 self.twod_grid = None
                 diff_x = self.max_x - self.min_x
-                self.axis_x = scene.visuals.Arrow(pos=np.array([[0, 0], [diff_x, 0]]), color='r', parent=self.view.scene,
-                                                  arrows=np.array([[diff_x/50, 0, diff_x, 0], [diff_x/50, 0, diff_x, 0]]),
-                                                  arrow_size=8, arrow_color='r', arrow_type='triangle_60')
                 diff_y = self.max_y - self.min_y
-                self.axis_y = scene.visuals.Arrow(pos=np.array([[0, 0], [0, diff_y]]), color='g', parent=self.view.scene,
-                                                  arrows=np.array([[0, diff_y / 50, 0, diff_y], [0, diff_y / 50, 0, diff_y]]),
-                                                  arrow_size=8, arrow_color='g', arrow_type='triangle_60')
                 diff_z = (self.max_z - self.min_z) * self.vertical_exaggeration
-                self.axis_z = scene.visuals.Arrow(pos=np.array([[0, 0, 0], [0, 0, diff_z]]), color='b', parent=self.view.scene,
-                                                  arrows=np.array([[0, 0, diff_z/50, 0, 0, diff_z], [0, 0, diff_z/50, 0, 0, diff_z]]),
-                                                  arrow_size=8, arrow_color='b', arrow_type='triangle_60')
+                # one visual (and one draw call) for all three axes, red/green/blue line segments for x/y/z
+                axis_colors = np.array([[1, 0, 0, 1], [0, 1, 0, 1], [0, 0, 1, 1]], dtype=np.float32)
+                self.axis_3d = scene.visuals.Arrow(pos=np.array([[0, 0, 0], [diff_x, 0, 0], [0, 0, 0], [0, diff_y, 0],
+                                                                 [0, 0, 0], [0, 0, diff_z]]),
+                                                   connect='segments', color=np.repeat(axis_colors, 2, axis=0),
+                                                   arrows=np.array([[diff_x / 50, 0, 0, diff_x, 0, 0],
+                                                                    [0, diff_y / 50, 0, 0, diff_y, 0],
+                                                                    [0, 0, diff_z / 50, 0, 0, diff_z]]),
+                                                   arrow_size=8, arrow_color=axis_colors, arrow_type='triangle_60',
+                                                   parent=self.view.scene)
             else:
                 title = scene.Label(" ", color='white')
                 title.height_max = 10
@@ -990,10 +1348,14 @@ class ThreeDView(QtWidgets.QWidget):
         if color_by == 'id':
             if len(self.z) + 1 > 2**32:
                 raise NotImplementedError('Got more than 2^32 points, cant encode an ID as RGBA...')
-            # color each sounding by a unique id encoded as RGBA
-            ids = np.arange(1, len(self.z) + 1, dtype=np.uint32).view(np.uint8)
-            ids = ids.reshape(-1, 4)
-            clrs = np.divide(ids, 255, dtype=np.float32)
+            # color each sounding by a unique id encoded as RGBA.  The ids only depend on the number of points, so we
+            #  keep them around for the next selection
+            if self._id_colors is None or self._id_colors.shape[0] != len(self.z):
+                ids = np.arange(1, len(self.z) + 1, dtype=np.uint32).view(np.uint8)
+                ids = ids.reshape(-1, 4)
+                self._id_colors = np.divide(ids, 255, dtype=np.float32)
+                self._id_colors.flags.writeable = False
+            clrs = self._id_colors
             cmap = None
             if color_selected:
                 raise NotImplementedError('color_selected not allowed when coloring by ID, this is just for picking points...')
@@ -1002,54 +1364,101 @@ class ThreeDView(QtWidgets.QWidget):
         elif color_by == 'depth':
             min_val = self.min_z
             max_val = self.max_z
-            clrs, cmap = normalized_arr_to_rgb_v2((self.z - self.min_z) / (self.max_z - self.min_z), reverse=True)
+            clrs, cmap = arr_to_rgb(self.z, self.min_z, self.max_z, reverse=True)
         elif color_by == 'vertical_uncertainty':
             min_val = self.min_tvu
             max_val = self.max_tvu
-            clrs, cmap = normalized_arr_to_rgb_v2((self.tvu - self.min_tvu) / (self.max_tvu - self.min_tvu))
+            clrs, cmap = arr_to_rgb(self.tvu, self.min_tvu, self.max_tvu)
         elif color_by == 'beam':
             min_val = self.min_beam
             max_val = self.max_beam
-            clrs, cmap = normalized_arr_to_rgb_v2(self.beam / self.max_beam, band_count=self.max_beam)
+            clrs, cmap = arr_to_rgb(self.beam, 0, self.max_beam, band_count=self.max_beam)
         elif color_by == 'rejected':
             min_val = 0
             max_val = 3
-            cmap = ListedColormap(['white', 'blue', 'red', 'cyan'])
-            clrs = cmap(self.rejected / 3)
+            cmap = rejected_colormap
+            clrs = np.take(rejected_lut, self.rejected, axis=0, mode='clip')
         elif color_by in ['system', 'linename']:
             min_val = 0
             if color_by == 'system':
-                vari = self.id
+                sys_idx = self._system_idx
                 uvari = self.unique_systems
             else:
-                vari = self.linename
+                sys_idx = self._linename_idx
                 uvari = self.unique_linenames
-            sys_idx = np.zeros(vari.shape[0], dtype=np.int32)
-            for cnt, us in enumerate(uvari):
-                usidx = vari == us
-                sys_idx[usidx] = cnt
             max_val = len(uvari)
-            clrs, cmap = normalized_arr_to_rgb_v2((sys_idx / max_val), band_count=max_val)
+            clrs, cmap = arr_to_rgb(sys_idx, 0, max_val, band_count=max_val)
         else:
             raise ValueError('Coloring by {} is not supported at this time'.format(color_by))
 
-        if self.selected_points is not None and self.selected_points.any() and color_selected:
-            msk = np.zeros(self.displayed_points.shape[0], dtype=bool)
-            msk[self.selected_points] = True
-            clrs[msk, :] = kluster_variables.selected_point_color
+        if self.selected_points is not None and self.selected_points.size and color_selected:
+            clrs[self.selected_points] = kluster_variables.selected_point_color
             if self.superselected_index is not None:
-                msk[:] = False
-                msk[self.selected_points[self.superselected_index]] = True
-                clrs[msk, :] = kluster_variables.super_selected_point_color
+                clrs[self.selected_points[self.superselected_index]] = kluster_variables.super_selected_point_color
 
+        # only need to copy the colors if we are dropping the rejected soundings
         if not self.show_rejected:
-            msk = self.rejected != kluster_variables.rejected_flag
-        else:
-            msk = np.ones_like(self.rejected, dtype=bool)
-        clrs = clrs[msk]
+            clrs = clrs[self._not_rejected_mask()]
 
         return clrs, cmap, min_val, max_val
 
+    def _not_rejected_mask(self):
+        """
+        Return a boolean mask of the points that are not rejected, used to drop the rejected soundings from the display.
+        The mask is built in a buffer we keep around, so it is only valid until the next call.
+
+        Returns
+        -------
+        np.ndarray
+            bool array, True where the point is not rejected
+        """
+
+        if self._scratch_mask is None or self._scratch_mask.shape[0] != self._point_count:
+            self._scratch_mask = np.empty(self._point_count, dtype=bool)
+        np.not_equal(self.rejected, kluster_variables.rejected_flag, out=self._scratch_mask)
+        return self._scratch_mask
+
+    def _scatter_positions(self):
+        """
+        Return the point positions for the scatter plot.  3d view gets the xyz, 2d view gets either xz or yz depending
+        on view direction.  The 2d projections are strided views of displayed_points, so the only copy made is when
+        we need to drop the rejected soundings.
+
+        Returns
+        -------
+        np.ndarray
+            (N,3) or (N,2) array of positions, None if the view direction is not supported in 2d
+        """
+
+        if self.is_3d:
+            pos = self.displayed_points
+        elif self.view_direction in ['north']:
+            pos = self.displayed_points[:, 0::2]
+        elif self.view_direction in ['east', 'arrow']:
+            pos = self.displayed_points[:, 1:]
+        else:
+            return None
+        if not self.show_rejected:
+            pos = pos[self._not_rejected_mask()]
+        return pos
+
+    def _set_scatter_data(self, clrs: np.ndarray):
+        """
+        Run set_data on the scatter with the current positions and the given colors, and record which points were shown
+        so that _set_scatter_colors knows when the positions on the GPU are out of date.
+
+        Parameters
+        ----------
+        clrs
+            (N,4) array, where N is the number of points and the values are the RGBA values for each point
+        """
+
+        pos = self._scatter_positions()
+        if pos is not None:
+            self.scatter.set_data(pos, edge_color=clrs, face_color=clrs, symbol='o', size=3)
+            self._scatter_show_rejected = self.show_rejected
+            self._scatter_shown_mask = None if self.show_rejected else self._not_rejected_mask().copy()
+
     def _build_scatter(self, clrs: np.ndarray):
         """
         Populate the scatter plot with data.  3d view gets the xyz, 2d view gets either xz or yz depending on view
@@ -1062,12 +1471,8 @@ class ThreeDView(QtWidgets.QWidget):
             (N,4) array, where N is the number of points and the values are the RGBA values for each point
         """
 
-        if not self.show_rejected:
-            msk = self.rejected != kluster_variables.rejected_flag
-        else:
-            msk = np.ones_like(self.rejected, dtype=bool)
+        self._set_scatter_data(clrs)
         if self.is_3d:
-            self.scatter.set_data(self.displayed_points[msk], edge_color=clrs, face_color=clrs, symbol='o', size=3)
             if self.view.camera.fresh_camera:
                 self.view.camera.center = (self.mean_x - self.x_offset, self.mean_y - self.y_offset, self.mean_z - self.min_z)
                 self.view.camera.distance = (self.max_x - self.x_offset) * 2
@@ -1075,18 +1480,33 @@ class ThreeDView(QtWidgets.QWidget):
                 self.view.camera.view_changed()
         else:
             if self.view_direction in ['north']:
-                self.scatter.set_data(self.displayed_points[msk][:, [0, 2]], edge_color=clrs, face_color=clrs, symbol='o', size=3)
                 self.view.camera.center = (self.mean_x - self.x_offset, self.mean_z - self.min_z)
                 if self.view.camera.fresh_camera:
                     self.view.camera.zoom((self.max_x - self.x_offset) + 10)  # try and fit the swath in view on load
                     self.view.camera.fresh_camera = False
             elif self.view_direction in ['east', 'arrow']:
-                self.scatter.set_data(self.displayed_points[msk][:, [1, 2]], edge_color=clrs, face_color=clrs, symbol='o', size=3)
                 self.view.camera.center = (self.mean_y - self.y_offset, self.mean_z - self.min_z)
                 if self.view.camera.fresh_camera:
                     self.view.camera.zoom((self.max_y - self.y_offset) + 10)  # try and fit the swath in view on load
                     self.view.camera.fresh_camera = False
 
+    def _horizontal_arrays(self):
+        """
+        Return the horizontal coordinate arrays used for the current view direction, the rotated coordinates for the
+        'arrow' view direction, eastings/northings otherwise.  Statistics and display both run off of these.
+
+        Returns
+        -------
+        np.ndarray
+            float32 array, x coordinate relative to the point origin
+        np.ndarray
+            float32 array, y coordinate relative to the point origin
+        """
+
+        if self.view_direction in ['north', 'east', 'top']:
+            return self.x_local, self.y_local
+        return self.rotx, self.roty
+
     def _build_statistics(self):
         """
         Triggered on display_points.  After all the points are added (add_points called over and over for each new
@@ -1095,38 +1515,19 @@ class ThreeDView(QtWidgets.QWidget):
         These are used later for constructing colormaps and setting the camera.
         """
 
-        if self.view_direction in ['north', 'east', 'top']:
-            self.min_x = np.nanmin(self.x)
-            self.min_y = np.nanmin(self.y)
-            self.max_x = np.nanmax(self.x)
-            self.max_y = np.nanmax(self.y)
-            self.mean_x = np.nanmean(self.x)
-            self.mean_y = np.nanmean(self.y)
-        else:
-            self.min_x = np.nanmin(self.rotx)
-            self.min_y = np.nanmin(self.roty)
-            self.max_x = np.nanmax(self.rotx)
-            self.max_y = np.nanmax(self.roty)
-            self.mean_x = np.nanmean(self.rotx)
-            self.mean_y = np.nanmean(self.roty)
-
-        self.min_z = np.nanmin(self.z)
-        self.min_tvu = np.nanmin(self.tvu)
-        self.min_rejected = np.nanmin(self.rejected)
-        self.min_beam = np.nanmin(self.beam)
-
-        self.max_z = np.nanmax(self.z)
-        self.max_tvu = np.nanmax(self.tvu)
-        self.max_rejected = np.nanmax(self.rejected)
-        self.max_beam = np.nanmax(self.beam)
-
-        self.mean_z = np.nanmean(self.z)
-        self.mean_tvu = np.nanmean(self.tvu)
-        self.mean_rejected = np.nanmean(self.rejected)
-        self.mean_beam = np.nanmean(self.beam)
-
-        self.unique_systems = np.unique(self.id).tolist()
-        self.unique_linenames = np.unique(self.linename).tolist()
+        # one pass over each array for min/max/mean, these point clouds are large enough that the three separate
+        #  np.nanmin/np.nanmax/np.nanmean passes are all memory bound
+        horiz_x, horiz_y = self._horizontal_arrays()
+        self.min_x, self.max_x, self.mean_x = nan_min_max_mean(horiz_x)
+        self.min_y, self.max_y, self.mean_y = nan_min_max_mean(horiz_y)
+
+        self.min_z, self.max_z, self.mean_z = nan_min_max_mean(self.z)
+        self.min_tvu, self.max_tvu, self.mean_tvu = nan_min_max_mean(self.tvu)
+        self.min_rejected, self.max_rejected, self.mean_rejected = nan_min_max_mean(self.rejected)
+        self.min_beam, self.max_beam, self.mean_beam = nan_min_max_mean(self.beam)
+
+        self.unique_systems, self._system_idx = self.unique_category('id')
+        self.unique_linenames, self._linename_idx = self.unique_category('linename')
 
     def display_points(self, color_by: str = 'depth', vertical_exaggeration: float = 1.0, view_direction: str = 'north',
                        show_axis: bool = True, show_rejected: bool = True):
@@ -1158,7 +1559,7 @@ class ThreeDView(QtWidgets.QWidget):
             maximum value to use for the color bar
         """
 
-        if not self.z.any():
+        if not self._point_count:
             return None, None, None
 
         self._configure_2d_3d_view()
@@ -1175,22 +1576,24 @@ class ThreeDView(QtWidgets.QWidget):
         self.x_offset = self.min_x
         self.y_offset = self.min_y
         self.z_offset = self.min_z
-        centered_z = self.z - self.z_offset
-
-        if view_direction in ['north', 'east', 'top']:
-            centered_x = self.x - self.x_offset
-            centered_y = self.y - self.y_offset
-        else:
-            centered_x = self.rotx - self.x_offset
-            centered_y = self.roty - self.y_offset
+        # float32 is plenty for the centered values and is what vispy uploads.  Reuse the buffer from the last
+        #  display if the point count has not changed, and write the centered values straight into it
+        if self._displayed_buf is None or self._displayed_buf.shape[0] != self._point_count:
+            self._displayed_buf = np.empty((self._point_count, 3), dtype=np.float32)
+        horiz_x, horiz_y = self._horizontal_arrays()
+        np.subtract(horiz_x, self.x_offset, out=self._displayed_buf[:, 0], casting='unsafe')
+        np.subtract(horiz_y, self.y_offset, out=self._displayed_buf[:, 1], casting='unsafe')
 
         # camera assumes z is positive up, flip the values
+        centered_z = self._displayed_buf[:, 2]
         if self.is_3d:
-            centered_z = (centered_z - centered_z.max()) * -1 * vertical_exaggeration
+            # (z - min_z - (max_z - min_z)) * -1 * vertical_exaggeration
+            np.subtract(self.max_z, self.z, out=centered_z)
+            centered_z *= vertical_exaggeration
         else:
-            centered_z = centered_z * -1
+            np.subtract(self.z_offset, self.z, out=centered_z)
 
-        self.displayed_points = np.stack([centered_x, centered_y, centered_z], axis=1)
+        self.displayed_points = self._displayed_buf
         clrs, cmap, minval, maxval = self._build_color_by_soundings(color_by)
 
         self.scatter = scene.visuals.Markers(parent=self.view.scene)
@@ -1207,24 +1610,49 @@ class ThreeDView(QtWidgets.QWidget):
 
         return cmap, minval, maxval
 
+    def _set_scatter_colors(self, clrs: np.ndarray):
+        """
+        Only the colors change when highlighting, the points are already on the GPU.  Rather than run set_data (which
+        rebuilds the positions and validates every color), write the new colors into the vertex data the Markers visual
+        already holds and upload that.  Only valid if the shown points have not changed since the last set_data (i.e.
+        reject/accept/undo with show_rejected=False changes which points are shown), otherwise we return False.
+
+        Parameters
+        ----------
+        clrs
+            (N,4) array, where N is the number of points and the values are the RGBA values for each point
+
+        Returns
+        -------
+        bool
+            True if the colors were updated, False if the scatter has no matching vertex data and needs set_data
+        """
+
+        if self._scatter_show_rejected is None or self._scatter_show_rejected != self.show_rejected:
+            return False
+        if not self.show_rejected and not np.array_equal(self._scatter_shown_mask, self._not_rejected_mask()):
+            return False
+        data = getattr(self.scatter, '_data', None)
+        vbo = getattr(self.scatter, '_vbo', None)
+        if data is None or vbo is None or data.dtype.names is None or len(data) != len(clrs):
+            return False
+        try:
+            data['a_fg_color'] = clrs
+            data['a_bg_color'] = clrs
+        except (KeyError, ValueError):  # vispy vertex data layout is not what we expect, use set_data
+            return False
+        vbo.set_data(data)
+        self.scatter.update()
+        return True
+
     def highlight_selected_scatter(self, color_by, color_selected=True):
         """
         A quick highlight method that circumvents the slower set_data.  Simply set the new colors and update the data.
         """
 
         clrs, cmap, minval, maxval = self._build_color_by_soundings(color_by, color_selected)
-        if self.scatter is not None:
-            if not self.show_rejected:
-                msk = self.rejected != kluster_variables.rejected_flag
-            else:
-                msk = np.ones_like(self.rejected, dtype=bool)
-            if self.is_3d:
-                self.scatter.set_data(self.displayed_points[msk], edge_color=clrs, face_color=clrs, symbol='o', size=3)
-            else:
-                if self.view_direction in ['north']:
-                    self.scatter.set_data(self.displayed_points[msk][:, [0, 2]], edge_color=clrs, face_color=clrs, symbol='o', size=3)
-                elif self.view_direction in ['east', 'arrow']:
-                    self.scatter.set_data(self.displayed_points[msk][:, [1, 2]], edge_color=clrs, face_color=clrs, symbol='o', size=3)
+        if self.scatter is not None and not self._set_scatter_colors(clrs):
+            self._set_scatter_data(clrs)
         return cmap, minval, maxval
 
     def clear_display(self):
@@ -1235,6 +1663,8 @@ class ThreeDView(QtWidgets.QWidget):
             # By setting the scatter visual parent to None, we delete it (clearing the widget)
             self.scatter.parent = None
             self.scatter = None
+            self._scatter_show_rejected = None
+            self._scatter_shown_mask = None
         if self.twod_grid:
             self.canvas.central_widget.remove_widget(self.twod_grid)
         self.twod_grid = None
@@ -1244,31 +1674,12 @@ class ThreeDView(QtWidgets.QWidget):
         Clear display and all stored data
         """
         self.clear_display()
-        self.id = np.array([], dtype=object)
-        self.head = np.array([], dtype=np.int8)
-        self.x = np.array([], dtype=np.float64)
-        self.y = np.array([], dtype=np.float64)
-        self.z = np.array([], dtype=np.float32)
-        self.rotx = np.array([], dtype=np.float64)
-        self.roty = np.array([], dtype=np.float64)
-        self.tvu = np.array([], dtype=np.float32)
-        self.rejected = np.array([], dtype=np.int32)
-        self.pointtime = np.array([], dtype=np.float64)
-        self.beam = np.array([], dtype=np.int32)
-        self.linename = np.array([], dtype=object)
+        self._allocate_points()
 
         self.idrange = {}
         self.idlookup = {}
 
-        if self.axis_x is not None:
-            self.axis_x.parent = None
-            self.axis_x = None
-        if self.axis_y is not None:
-            self.axis_y.parent = None
-            self.axis_y = None
-        if self.axis_z is not None:
-            self.axis_z.parent = None
-            self.axis_z = None
+        self._clear_axes()
         if self.twod_grid:
             self.canvas.central_widget.remove_widget(self.twod_grid)
         self.twod_grid = None
@@ -1344,7 +1755,7 @@ class ThreeDWidget(QtWidgets.QWidget):
         self.opts_layout.addWidget(self.show_rejected)
         self.opts_layout.addStretch()
 
-        self.colorbar = ColorBar()
+        self.colorbar = QColorBar()
 
         self.viewlayout = QtWidgets.QHBoxLayout()
         self.viewlayout.addWidget(self.three_d_window)
@@ -1483,6 +1894,13 @@ class ThreeDWidget(QtWidgets.QWidget):
         self.three_d_window.superselected_index = None
         self.three_d_window.add_points(head, x, y, z, tvu, rejected, pointtime, beam, newid, linename, azimuth=azimuth)
 
+    def reserve_points(self, count: int):
+        """
+        Make room for count more points in the three d window, see ThreeDView.reserve_points
+        """
+
+        self.three_d_window.reserve_points(count)
+
     def return_points(self):
         return self.three_d_window.return_points()
 
@@ -1490,39 +1908,32 @@ class ThreeDWidget(QtWidgets.QWidget):
         if three_d:
             # color the points by a unique rgba value, render with the new color and pull the id of the point by its color
             #  this is a workaround for the 3d camera transforms not working.  See https://github.com/vispy/vispy/issues/1336
-            startpos_canvas = self.three_d_window.canvas.transforms.canvas_transform.map(startpos)
-            endpos_canvas = self.three_d_window.canvas.transforms.canvas_transform.map(endpos)
-            points_in_screen = np.zeros_like(self.three_d_window.displayed_points[:, 0], dtype=bool)
+            # map both corners of the selection box in one transform call
+            startpos_canvas, endpos_canvas = self.three_d_window.canvas.transforms.canvas_transform.map(np.array([startpos[:2], endpos[:2]]))
             self.three_d_window.scatter.update_gl_state(blend=False)
             self.three_d_window.scatter.antialias = 0
             self.three_d_window.highlight_selected_scatter('id', False)
             minx, miny = min(startpos_canvas[0], endpos_canvas[0]), min(startpos_canvas[1], endpos_canvas[1])
             window_width, window_height = max(abs(startpos_canvas[0] - endpos_canvas[0]), 1), max(abs(startpos_canvas[1] - endpos_canvas[1]), 1)
             img = self.three_d_window.canvas.render((int(minx), int(miny), int(window_width), int(window_height)), bgcolor=(0, 0, 0, 0))
-            idxs = img.ravel().view(np.uint32)
-            if idxs.any():
-                idxs = np.unique(idxs)
-                idx = idxs[idxs != 0]
-                if idx.any():
-                    # subtract one; color 0 was reserved for the background
-                    idx = idx - 1
-                    # filter out the out of bounds indices
-                    idx = idx[np.logical_and(idx > 0, idx < points_in_screen.shape[0])]
-                    points_in_screen[idx] = True
+            # np.unique returns the ids sorted, so no need to go through a full length mask to get the sorted index
+            idx = np.unique(img.ravel().view(np.uint32))
+            # color 0 was reserved for the background, filter out that and the out of bounds indices
+            idx = idx[(idx > 1) & (idx <= self.three_d_window.displayed_points.shape[0])]
+            # subtract one to get back to the point index
+            points_in_screen = idx.astype(np.int64) - 1
             self.three_d_window.scatter.update_gl_state(blend=True)
             self.three_d_window.scatter.antialias = 1
-            points_in_screen = np.argwhere(points_in_screen)[:, 0]
         else:
             vd = self.viewdirection2d.currentText()
             if vd in ['north']:
-                m1 = self.three_d_window.displayed_points[:, [0, 2]] >= startpos[0:2]
-                m2 = self.three_d_window.displayed_points[:, [0, 2]] <= endpos[0:2]
+                horiz = self.three_d_window.displayed_points[:, 0]
             elif vd in ['east', 'arrow']:
-                m1 = self.three_d_window.displayed_points[:, [1, 2]] >= startpos[0:2]
-                m2 = self.three_d_window.displayed_points[:, [1, 2]] <= endpos[0:2]
+                horiz = self.three_d_window.displayed_points[:, 1]
             else:
                 raise NotImplementedError('View direction not one of north, east, arrow: {}'.format(vd))
-            points_in_screen = np.argwhere(m1[:, 0] & m1[:, 1] & m2[:, 0] & m2[:, 1])[:, 0]
+            vert = self.three_d_window.displayed_points[:, 2]
+            points_in_screen = np.nonzero((horiz >= startpos[0]) & (horiz <= endpos[0]) & (vert >= startpos[1]) & (vert <= endpos[1]))[0]
         return points_in_screen
 
     def select_points(self, startpos, endpos, three_d: bool = False):
@@ -1534,16 +1945,11 @@ class ThreeDWidget(QtWidgets.QWidget):
         points_in_screen = self._handle_point_selection(startpos, endpos, three_d)
         self.three_d_window.selected_points = points_in_screen
         self.three_d_window.superselected_index = None
-        self.points_selected.emit(np.arange(self.three_d_window.selected_points.shape[0]),
-                                  self.three_d_window.linename[self.three_d_window.selected_points],
-                                  self.three_d_window.pointtime[self.three_d_window.selected_points],
-                                  self.three_d_window.beam[self.three_d_window.selected_points],
-                                  self.three_d_window.x[self.three_d_window.selected_points],
-                                  self.three_d_window.y[self.three_d_window.selected_points],
-                                  self.three_d_window.z[self.three_d_window.selected_points],
-                                  self.three_d_window.tvu[self.three_d_window.selected_points],
-                                  self.three_d_window.rejected[self.three_d_window.selected_points],
-                                  self.three_d_window.id[self.three_d_window.selected_points])
+        tdw = self.three_d_window
+        self.points_selected.emit(np.arange(points_in_screen.shape[0]), tdw.decode_category('linename', points_in_screen),
+                                  tdw.pointtime[points_in_screen], tdw.beam[points_in_screen], tdw.x[points_in_screen],
+                                  tdw.y[points_in_screen], tdw.z[points_in_screen], tdw.tvu[points_in_screen],
+                                  tdw.rejected[points_in_screen], tdw.decode_category('id', points_in_screen))
         self.three_d_window.highlight_selected_scatter(self.colorby.currentText())
 
     def clear_selection(self):
@@ -1605,7 +2011,7 @@ class ThreeDWidget(QtWidgets.QWidget):
 
         idx = {}
         if self.three_d_window.selected_points is not None:
-            select_id = self.three_d_window.id[self.three_d_window.selected_points]
+            select_id = self.three_d_window.decode_category('id', self.three_d_window.selected_points)
             uniq_ids = np.unique(select_id)
             source_ids = [self.three_d_window.idlookup[uqid] for uqid in uniq_ids]
             for uid, sid in zip(uniq_ids, source_ids):
@@ -1647,7 +2053,7 @@ class ThreeDWidget(QtWidgets.QWidget):
 
         idx = {}
         if self.three_d_window.selected_points is not None:
-            select_id = self.three_d_window.id[self.three_d_window.selected_points]
+            select_id = self.three_d_window.decode_category('id', self.three_d_window.selected_points)
             uniq_ids = np.unique(select_id)
             source_ids = [self.three_d_window.idlookup[uqid] for uqid in uniq_ids]
             for uid, sid in zip(uniq_ids, source_ids):
@@ -1752,10 +2158,19 @@ class ThreeDWidget(QtWidgets.QWidget):
 
     def refresh_settings(self, e):
         """
-        After any substantial change to the point data or scale, we clear and redraw the points
+        After any substantial change to the point data or scale, we clear and redraw the points.  Toggling the rejected
+        soundings only changes which points are shown, so we update the existing scatter plot (new colors and masked
+        positions, see highlight_selected_scatter) rather than rebuilding the view.
         """
+
+        sender = self.sender()
+        if self.three_d_window.scatter is not None:
+            if sender is self.show_rejected:
+                self.three_d_window.show_rejected = self.show_rejected.isChecked()
+                self.change_color_by(None)
+                return
         self.clear_display()
-        if self.three_d_window.x.any():
+        if self.three_d_window.x_local.size:
             self.display_points()
 
     def clear_display(self):
@@ -1785,15 +2200,83 @@ def normalized_arr_to_rgb_v2(z_array_normalized: np.array, reverse: bool = False
     Returns
     -------
     np.array
-        (n,4) array, where n is the length of z_array_normalized
+        (n,4) float32 array, where n is the length of z_array_normalized
+    matplotlib.colors.ColorMap
+        cmap object that we use later to build the color bar
+    """
+
+    return arr_to_rgb(z_array_normalized, 0.0, 1.0, reverse=reverse, colormap=colormap, band_count=band_count)
+
+
+def arr_to_rgb(arr: np.array, minval: float, maxval: float, reverse: bool = False, colormap: str = 'rainbow',
+               band_count: int = 50):
+    """
+    Build an RGB array from an input array, scaling the values between minval and maxval to the colormap as we go,
+    so there is no need to build a normalized copy of the array first.  Colormap will be a string identifier that can
+    be parsed by the matplotlib colormap object.
+
+    Parameters
+    ----------
+    arr
+        1d array that you want to convert to an RGB array
+    minval
+        value that maps to the start of the colormap
+    maxval
+        value that maps to the end of the colormap
+    reverse
+        if true, reverses the colormap
+    colormap
+        string identifier that is accepted by matplotlib
+    band_count
+        number of color bands to pull from the colormap
+
+    Returns
+    -------
+    np.array
+        (n,4) float32 array, where n is the length of arr
     matplotlib.colors.ColorMap
         cmap object that we use later to build the color bar
     """
+
+    cmap, lut = _colormap_lut(colormap, reverse, int(band_count))
+    clrs = np.empty((arr.shape[0], 4), dtype=np.float32)
+    lut_colors(arr, float(minval), float(maxval), lut, clrs)
+    return clrs, cmap
+
+
+@lru_cache(maxsize=32)
+def _colormap_lut(colormap: str, reverse: bool, band_count: int):
+    """
+    Build (and cache) the matplotlib colormap and the float32 RGBA lookup table for it, so that recoloring the points
+    is a single gather from the table instead of rebuilding and evaluating the colormap each time.
+
+    Parameters
+    ----------
+    colormap
+        string identifier that is accepted by matplotlib
+    reverse
+        if true, reverses the colormap
+    band_count
+        number of color bands to pull from the colormap
+
+    Returns
+    -------
+    matplotlib.colors.ColorMap
+        cmap object that we use later to build the color bar
+    np.array
+        (band_count + 1, 4) read only float32 array, one entry per band with the colormap 'bad' color as the last entry
+    """
+
     if reverse:
         cmap = cm.get_cmap(colormap + '_r', band_count)
     else:
         cmap = cm.get_cmap(colormap, band_count)
-    return cmap(z_array_normalized), cmap
+    # vispy uploads colors as float32, scale the 8 bit colormap table to float32 rather than building (and later
+    #  converting) a float64 array.  Screen colors are 8 bit anyway
+    band_centers = np.append((np.arange(band_count) + 0.5) / band_count, np.nan)
+    lut = np.divide(cmap(band_centers, bytes=True), 255, dtype=np.float32)
+    lut.flags.writeable = False
+    return cmap, lut
 
 
 if __name__ == '__main__':
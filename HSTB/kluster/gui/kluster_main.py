@@ -1434,7 +1434,7 @@ class KlusterMain(QtWidgets.QMainWindow):
                 self.app.setStyleSheet(qdarkstyle.load_stylesheet(qt_api=self.app_library))
                 self.two_d.canvas.setCanvasColor(QtCore.Qt.black)
                 self.two_d.toolPoints.base_color = QtCore.Qt.white
-                self.points_view.colorbar.fig.set_facecolor('black')
+                self.points_view.colorbar.set_facecolor('black')
                 plt.style.use('dark_background')
             except:
                 print('Unable to set qdarkstyle style sheet for app library {}'.format(self.app_library))
@@ -1442,7 +1442,7 @@ class KlusterMain(QtWidgets.QMainWindow):
             self.app.setStyleSheet('')
             self.two_d.canvas.setCanvasColor(QtCore.Qt.white)
             self.two_d.toolPoints.base_color = QtCore.Qt.black
-            self.points_view.colorbar.fig.set_facecolor('white')
+            self.points_view.colorbar.set_facecolor('white')
             plt.style.use('seaborn')
         # now update the control if we are doing this manually, not through the checkbox event
         view_menu = [mn for mn in self.menuBar().actions() if mn.text() == 'View']
@@ -1760,6 +1760,7 @@ class KlusterMain(QtWidgets.QMainWindow):
         if not self.load_points_thread.error:
             points_data = self.load_points_thread.points_data
             azimuth = self.load_points_thread.azimuth
+            self.points_view.reserve_points(sum([pointdata[0].size for pointdata in points_data.values()]))
             for fqpr_name, pointdata in points_data.items():
                 self.points_view.add_points(pointdata[0], pointdata[1], pointdata[2], pointdata[3], pointdata[4], pointdata[5],
                                             pointdata[6], pointdata[7], fqpr_name, pointdata[8], azimuth=azimuth)
@@ -1,16 +1,32 @@
 import numpy as np
 import xarray as xr
+import dask
 import laspy
 import os
+import threading
 from time import perf_counter
+from typing import Union
 from datetime import datetime
 
 from HSTB.kluster.pydro_helpers import is_pydro
 from HSTB.kluster.pdal_entwine import build_entwine_points
 from HSTB.kluster.fqpr_helpers import seconds_to_formatted_string
 from HSTB.kluster.xarray_helpers import slice_xarray_by_dim
+from HSTB.kluster.numba_helpers import format_fixed_point_csv, group_indices, nan_min_max_mean, xyz_minima
 from HSTB.kluster.kluster_variables import variable_format_str, pings_per_csv, pings_per_las
 
+# detectioninfo flag to LAS classification, amplitude/phase (0, 1) to 1 = Unclassified and rejected (2) to 7 = Low
+#  Point (noise) according to the LAS spec, everything else is kept as is
+las_classification_lut = np.arange(256).astype(np.int8)
+las_classification_lut[:2] = 1
+las_classification_lut[2] = 7
+# number of points written at a time in the laspy 2.0 las export
+las_write_chunksize = 1000000
+# number of rows formatted and written at a time in the csv export, around 40MB of text
+csv_write_chunksize = 1000000
+# per thread working buffers reused across the sector csv/las writes, see _scratch_buffer
+_scratch_buffers = threading.local()
+
 
 class FqprExport:
     """
@@ -31,89 +47,13 @@ class FqprExport:
             Fqpr instance to export from
         """
         self.fqpr = fqpr
+        self._pending_writes = []
 
     def _generate_export_data(self, ping_dataset: xr.Dataset, filter_by_detection: bool = True, z_pos_down: bool = True):
         """
-        Take the georeferenced data in the multibeam.raw_ping datasets held by fqpr_generation.Fqpr (ping_dataset is one of those
-        raw_ping datasets) and build the necessary arrays for exporting.
-
-        Parameters
-        ----------
-        ping_dataset
-            one of the multibeam.raw_ping xarray Datasets, must contain the x,y,z variables generated by georeferencing
-        filter_by_detection
-            if True, will filter the xyz data by the detection info flag (rejected by multibeam system)
-        z_pos_down
-            if True, will export soundings with z positive down (this is the native Kluster convention)
-
-        Returns
-        -------
-        xr.DataArray
-            x variable stacked in the time/beam dimension to create 1 dim representation.  rejected soundings removed
-            if filter_by_detection
-        xr.DataArray
-            y variable stacked in the time/beam dimension to create 1 dim representation.  rejected soundings removed
-            if filter_by_detection
-        xr.DataArray
-            z variable stacked in the time/beam dimension to create 1 dim representation.  rejected soundings removed
-            if filter_by_detection
-        xr.DataArray
-            uncertainty variable stacked in the time/beam dimension to create 1 dim representation.  rejected soundings removed
-            if filter_by_detection
-        np.array
-            indexes of the original z data before stacking, used to unstack x
-        np.array
-            if detectioninfo exists, this is the integer classification for each sounding
-        np.array
-            if detectioninfo exists, boolean mask for the valid detections
-        bool
-            if tvu exists, True
+        Build the arrays for exporting from one of the multibeam.raw_ping datasets, see the module level _generate_export_data
         """
-
-        uncertainty_included = False
-        nan_mask = ~np.isnan(ping_dataset['x'])
-        x_stck = ping_dataset['x'][nan_mask]
-        y_stck = ping_dataset['y'][nan_mask]
-        z_stck = ping_dataset['z'][nan_mask]
-        if 'tvu' in ping_dataset:
-            uncertainty_included = True
-            unc_stck = ping_dataset['tvu'][nan_mask]
-
-        # build mask with kongsberg detection info
-        classification = None
-        valid_detections = None
-        if 'detectioninfo' in ping_dataset:
-            dinfo = ping_dataset.detectioninfo
-            filter_stck = dinfo.values[nan_mask]
-            # filter_idx, filter_stck = stack_nan_array(dinfo, stack_dims=('time', 'beam'))
-            valid_detections = filter_stck != 2
-            tot = len(filter_stck)
-            tot_valid = np.count_nonzero(valid_detections)
-            tot_invalid = tot - tot_valid
-        # filter points by mask
-        unc = None
-        if filter_by_detection and valid_detections is not None:
-            x = x_stck[valid_detections]
-            y = y_stck[valid_detections]
-            z = z_stck[valid_detections]
-            classification = filter_stck[valid_detections]
-            if uncertainty_included:
-                unc = unc_stck[valid_detections]
-            print('{} total soundings, {} retained, {} filtered'.format(tot, tot_valid, tot_invalid))
-        else:
-            x = x_stck
-            y = y_stck
-            z = z_stck
-            if 'detectioninfo' in ping_dataset:
-                classification = filter_stck
-            if uncertainty_included:
-                unc = unc_stck
-
-        # z positive down is the native convention in Kluster, if you want positive up, gotta flip
-        if not z_pos_down:
-            z = z * -1
-
-        return x, y, z, unc, nan_mask, classification, valid_detections, uncertainty_included
+        return _generate_export_data(ping_dataset, filter_by_detection=filter_by_detection, z_pos_down=z_pos_down)
 
     def _validate_export(self, output_directory: str, file_format: str):
         """
@@ -266,31 +206,38 @@ class FqprExport:
         starttime = perf_counter()
         chunk_count = 0
         written_files = []
-        for rp in self.fqpr.multibeam.raw_ping:
-            self.fqpr.logger.info('Operating on system {}'.format(rp.system_identifier))
-            # build list of lists for the mintime and maxtime (inclusive) for each chunk, each chunk will contain number of pings equal to chunksize
-            chunktimes = [[float(rp.time.isel(time=int(i * chunksize))), float(rp.time.isel(time=int(min((i + 1) * chunksize - 1, rp.time.size - 1))))] for i in range(int(np.ceil(rp.time.size / 75000)))]
-            for mintime, maxtime in chunktimes:
-                chunk_count += 1
-                if suffix:
-                    new_suffix = suffix + '_{}'.format(chunk_count)
-                else:
-                    new_suffix = '{}'.format(chunk_count)
-                new_files = None
-                slice_rp = slice_xarray_by_dim(rp, dimname='time', start_time=mintime, end_time=maxtime)
-
-                if file_format == 'csv':
-                    new_files = self._export_pings_to_csv(rp=slice_rp, output_directory=fldr_path, suffix=new_suffix, csv_delimiter=csv_delimiter,
-                                                          filter_by_detection=filter_by_detection, z_pos_down=z_pos_down,
-                                                          export_by_identifiers=export_by_identifiers)
-                elif file_format in ['las', 'entwine']:
-                    new_files = self._export_pings_to_las(rp=slice_rp, output_directory=fldr_path, suffix=new_suffix, filter_by_detection=filter_by_detection,
-                                                          export_by_identifiers=export_by_identifiers)
-                if new_files:
-                    written_files += new_files
-            if file_format == 'entwine':
-                build_entwine_points(fldr_path, entwine_fldr_path)
-                written_files = [entwine_fldr_path]
+        try:
+            for rp in self.fqpr.multibeam.raw_ping:
+                self.fqpr.logger.info('Operating on system {}'.format(rp.system_identifier))
+                # build list of lists for the mintime and maxtime (inclusive) for each chunk, each chunk will contain number of pings equal to chunksize
+                chunktimes = [[float(rp.time.isel(time=int(i * chunksize))), float(rp.time.isel(time=int(min((i + 1) * chunksize - 1, rp.time.size - 1))))] for i in range(int(np.ceil(rp.time.size / 75000)))]
+                for mintime, maxtime in chunktimes:
+                    chunk_count += 1
+                    if suffix:
+                        new_suffix = suffix + '_{}'.format(chunk_count)
+                    else:
+                        new_suffix = '{}'.format(chunk_count)
+                    new_files = None
+                    slice_rp = slice_xarray_by_dim(rp, dimname='time', start_time=mintime, end_time=maxtime)
+
+                    # do not wait on the writes, let the cluster write this chunk while we load/group the next one
+                    if file_format == 'csv':
+                        new_files = self._export_pings_to_csv(rp=slice_rp, output_directory=fldr_path, suffix=new_suffix, csv_delimiter=csv_delimiter,
+                                                              filter_by_detection=filter_by_detection, z_pos_down=z_pos_down,
+                                                              export_by_identifiers=export_by_identifiers, wait_for_writes=False)
+                    elif file_format in ['las', 'entwine']:
+                        new_files = self._export_pings_to_las(rp=slice_rp, output_directory=fldr_path, suffix=new_suffix, filter_by_detection=filter_by_detection,
+                                                              export_by_identifiers=export_by_identifiers, wait_for_writes=False)
+                    if new_files:
+                        written_files += new_files
+            self._wait_for_pending_writes()
+        finally:
+            # no-op if the writes finished above, otherwise don't leave this export's writes for the next one to gather
+            self._cancel_pending_writes()
+        if file_format == 'entwine':
+            # build once from the las files of all systems, entwine reads every las file in the folder on each build
+            build_entwine_points(fldr_path, entwine_fldr_path)
+            written_files = [entwine_fldr_path]
 
         endtime = perf_counter()
         self.fqpr.logger.info('****Exporting xyz data to {} complete: {}****\n'.format(file_format, seconds_to_formatted_string(int(endtime - starttime))))
@@ -385,7 +332,8 @@ class FqprExport:
         return written_files
 
     def _export_pings_to_csv(self, rp: xr.Dataset, output_directory: str = None, suffix: str = None, csv_delimiter: str = ' ', filter_by_detection: bool = True,
-                             z_pos_down: bool = True, export_by_identifiers: bool = True, base_name: str = None):
+                             z_pos_down: bool = True, export_by_identifiers: bool = True, base_name: str = None,
+                             wait_for_writes: bool = True):
         """
         Method for exporting pings to csv files.  See export_pings_to_file to use.
 
@@ -407,6 +355,8 @@ class FqprExport:
             if True, will generate separate files for each combination of serial number/sector/frequency
         base_name
             optional, the base name of the exported file, if None it will use the folder name of the converted data
+        wait_for_writes
+            if False and we have a dask client, return once the writes are submitted, see _run_sector_exports
 
         Returns
         -------
@@ -421,22 +371,17 @@ class FqprExport:
             return
         if not base_name:
             base_name = os.path.split(rp.output_path)[1]
-        if 'sounding' not in rp.coords:  # check if this is already stacked, if not, stack
-            rp = rp.stack({'sounding': ('time', 'beam')})
+        rp = _stacked_export_arrays(rp)
         if export_by_identifiers:
-            for freq in np.unique(rp.frequency):
-                subset_rp = rp.where(rp.frequency == freq, drop=True)
-                for secid in np.unique(subset_rp.txsector_beam).astype(np.int):
-                    sec_subset_rp = subset_rp.where(subset_rp.txsector_beam == secid, drop=True)
-                    if suffix:
-                        dest_path = os.path.join(output_directory, '{}_{}_{}_{}.csv'.format(base_name, secid, freq, suffix))
-                    else:
-                        dest_path = os.path.join(output_directory, '{}_{}_{}.csv'.format(base_name, secid, freq))
-                    self.fqpr.logger.info('writing to {}'.format(dest_path))
-                    export_data = self._generate_export_data(sec_subset_rp, filter_by_detection=filter_by_detection, z_pos_down=z_pos_down)
-                    self._csv_write(export_data[0], export_data[1], export_data[2], export_data[3], export_data[7],
-                                    dest_path, csv_delimiter)
-                    written_files.append(dest_path)
+            sector_tasks = []
+            for freq, secid, sec_subset_rp in _split_by_identifiers(rp):
+                if suffix:
+                    dest_path = os.path.join(output_directory, '{}_{}_{}_{}.csv'.format(base_name, secid, freq, suffix))
+                else:
+                    dest_path = os.path.join(output_directory, '{}_{}_{}.csv'.format(base_name, secid, freq))
+                self.fqpr.logger.info('writing to {}'.format(dest_path))
+                sector_tasks.append([sec_subset_rp, dest_path, 'csv', filter_by_detection, z_pos_down, csv_delimiter, None])
+            written_files.extend(self._run_sector_exports(sector_tasks, wait_for_writes=wait_for_writes))
 
         else:
             if suffix:
@@ -444,55 +389,76 @@ class FqprExport:
             else:
                 dest_path = os.path.join(output_directory, base_name + '.csv')
             self.fqpr.logger.info('writing to {}'.format(dest_path))
-            export_data = self._generate_export_data(rp, filter_by_detection=filter_by_detection, z_pos_down=z_pos_down)
-            self._csv_write(export_data[0], export_data[1], export_data[2], export_data[3], export_data[7],
-                            dest_path, csv_delimiter)
-            written_files.append(dest_path)
+            written_files.extend(self._run_sector_exports([[rp, dest_path, 'csv', filter_by_detection, z_pos_down, csv_delimiter, None]],
+                                                          wait_for_writes=wait_for_writes))
 
         return written_files
 
-    def _csv_write(self, x: xr.DataArray, y: xr.DataArray, z: xr.DataArray, uncertainty: xr.DataArray,
-                   uncertainty_included: bool, dest_path: str, delimiter: str):
+    def _run_sector_exports(self, sector_tasks: list, wait_for_writes: bool = True):
         """
-        Write the data to csv
+        Each frequency/sector file is independent of the others, so when we have a dask client, write them in parallel
+        on the workers.  Otherwise write them one at a time here.
+
+        With wait_for_writes=False, we return as soon as the writes are submitted, so that the caller can load and
+        group the next chunk/system while the cluster writes this one.  We only keep one set of writes in flight
+        (waiting on the previous set here) to bound the memory held on the cluster, call _wait_for_pending_writes
+        when done.
 
         Parameters
         ----------
-        x
-            x variable stacked in the time/beam dimension to create 1 dim representation.  rejected soundings removed
-            if filter_by_detection
-        y
-            y variable stacked in the time/beam dimension to create 1 dim representation.  rejected soundings removed
-            if filter_by_detection
-        z
-            z variable stacked in the time/beam dimension to create 1 dim representation.  rejected soundings removed
-            if filter_by_detection
-        uncertainty
-            uncertainty variable stacked in the time/beam dimension to create 1 dim representation.  rejected soundings removed
-            if filter_by_detection
-        uncertainty_included
-            if tvu exists, True
-        dest_path
-            output path to write to
-        delimiter
-            csv delimiter to use
+        sector_tasks
+            list of lists, each one the arguments for _distrib_export_sector
+        wait_for_writes
+            if True, wait for the files to be written before returning
+
+        Returns
+        -------
+        list
+            list of written (or to be written, see wait_for_writes) file paths
         """
 
-        if uncertainty_included:
-            np.savetxt(dest_path, np.c_[x, y, z, uncertainty],
-                       fmt=['%3.3f', '%2.3f', '%4.3f', '%4.3f'],
-                       delimiter=delimiter,
-                       header='easting{}northing{}depth{}uncertainty'.format(delimiter, delimiter, delimiter),
-                       comments='')
-        else:
-            np.savetxt(dest_path, np.c_[x, y, z],
-                       fmt=['%3.3f', '%2.3f', '%4.3f'],
-                       delimiter=delimiter,
-                       header='easting{}northing{}depth'.format(delimiter, delimiter),
-                       comments='')
+        try:
+            futs = self.fqpr.client.map(_distrib_export_sector, sector_tasks, pure=False)
+        except:  # get here if client is closed or not setup
+            return [_distrib_export_sector(tsk) for tsk in sector_tasks]
+        self._wait_for_pending_writes()
+        if wait_for_writes:
+            return self.fqpr.client.gather(futs)
+        self._pending_writes = futs
+        return [tsk[1] for tsk in sector_tasks]
+
+    def _cancel_pending_writes(self):
+        """
+        Cancel and clear any writes left running on the cluster by _run_sector_exports(wait_for_writes=False), used when
+        an export fails part way through.
+        """
+
+        if self._pending_writes:
+            futs, self._pending_writes = self._pending_writes, []
+            try:
+                self.fqpr.client.cancel(futs)
+            except:  # get here if client is closed
+                pass
+
+    def _wait_for_pending_writes(self):
+        """
+        Wait on the writes left running on the cluster by _run_sector_exports(wait_for_writes=False), gather will raise
+        any exception from the workers here.
+        """
+
+        if self._pending_writes:
+            futs, self._pending_writes = self._pending_writes, []
+            self.fqpr.client.gather(futs)
+
+    def _csv_write(self, x: np.ndarray, y: np.ndarray, z: np.ndarray, uncertainty: np.ndarray,
+                   uncertainty_included: bool, dest_path: str, delimiter: str):
+        """
+        Write the data to csv, see the module level _csv_write
+        """
+        _csv_write(x, y, z, uncertainty, uncertainty_included, dest_path, delimiter)
 
     def _export_pings_to_las(self, rp: xr.Dataset, output_directory: str = None, suffix: str = '', filter_by_detection: bool = True,
-                             export_by_identifiers: bool = True, base_name: str = None):
+                             export_by_identifiers: bool = True, base_name: str = None, wait_for_writes: bool = True):
         """
         Uses the output of georef_along_across_depth to build sounding exports.  Currently you can export to csv or las
         file formats, see file_format argument.
@@ -521,6 +487,8 @@ class FqprExport:
             if True, will generate separate files for each combination of serial number/sector/frequency
         base_name
             optional, the base name of the exported file, if None it will use the folder name of the converted data
+        wait_for_writes
+            if False and we have a dask client, return once the writes are submitted, see _run_sector_exports
 
         Returns
         -------
@@ -536,130 +504,35 @@ class FqprExport:
         if filter_by_detection and 'detectioninfo' not in rp:
             self.fqpr.logger.error('_export_pings_to_las: Unable to filter by detection type, detectioninfo not found')
             return
-        if 'sounding' not in rp.coords:  # check if this is already stacked, if not, stack
-            rp = rp.stack({'sounding': ('time', 'beam')})
+        rp = _stacked_export_arrays(rp)
         if export_by_identifiers:
-            for freq in np.unique(rp.frequency):
-                subset_rp = rp.where(rp.frequency == freq, drop=True)
-                for secid in np.unique(subset_rp.txsector_beam).astype(np.int):
-                    sec_subset_rp = subset_rp.where(subset_rp.txsector_beam == secid, drop=True)
-                    if suffix:
-                        dest_path = os.path.join(output_directory, '{}_{}_{}_{}.las'.format(base_name, secid, freq, suffix))
-                    else:
-                        dest_path = os.path.join(output_directory, '{}_{}_{}.las'.format(base_name, secid, freq))
-                    self.fqpr.logger.info('writing to {}'.format(dest_path))
-                    export_data = self._generate_export_data(sec_subset_rp, filter_by_detection=filter_by_detection, z_pos_down=z_pos_down)
-                    self._las_write(export_data[0], export_data[1], export_data[2], export_data[3],
-                                    export_data[5], export_data[7], dest_path)
-                    written_files.append(dest_path)
+            sector_tasks = []
+            for freq, secid, sec_subset_rp in _split_by_identifiers(rp):
+                if suffix:
+                    dest_path = os.path.join(output_directory, '{}_{}_{}_{}.las'.format(base_name, secid, freq, suffix))
+                else:
+                    dest_path = os.path.join(output_directory, '{}_{}_{}.las'.format(base_name, secid, freq))
+                self.fqpr.logger.info('writing to {}'.format(dest_path))
+                sector_tasks.append([sec_subset_rp, dest_path, 'las', filter_by_detection, z_pos_down, None,
+                                     self.fqpr.horizontal_crs])
+            written_files.extend(self._run_sector_exports(sector_tasks, wait_for_writes=wait_for_writes))
         else:
             if suffix:
                 dest_path = os.path.join(output_directory, '{}_{}.las'.format(base_name, suffix))
             else:
                 dest_path = os.path.join(output_directory, base_name + '.las')
             self.fqpr.logger.info('writing to {}'.format(dest_path))
-            export_data = self._generate_export_data(rp, filter_by_detection=filter_by_detection, z_pos_down=z_pos_down)
-            self._las_write(export_data[0], export_data[1], export_data[2], export_data[3],
-                            export_data[5], export_data[7], dest_path)
-            written_files.append(dest_path)
+            written_files.extend(self._run_sector_exports([[rp, dest_path, 'las', filter_by_detection, z_pos_down, None,
+                                                            self.fqpr.horizontal_crs]], wait_for_writes=wait_for_writes))
 
         return written_files
 
-    def _las_write(self, x: xr.DataArray, y: xr.DataArray, z: xr.DataArray, uncertainty: xr.DataArray,
+    def _las_write(self, x: np.ndarray, y: np.ndarray, z: np.ndarray, uncertainty: np.ndarray,
                    classification: np.array, uncertainty_included: bool, dest_path: str):
         """
-        Write the data to LAS format
-
-        Parameters
-        ----------
-        x
-            x variable stacked in the time/beam dimension to create 1 dim representation.  rejected soundings removed
-            if filter_by_detection
-        y
-            y variable stacked in the time/beam dimension to create 1 dim representation.  rejected soundings removed
-            if filter_by_detection
-        z
-            z variable stacked in the time/beam dimension to create 1 dim representation.  rejected soundings removed
-            if filter_by_detection
-        uncertainty
-            uncertainty variable stacked in the time/beam dimension to create 1 dim representation.  rejected soundings removed
-            if filter_by_detection
-        classification
-            if detectioninfo exists, this is the integer classification for each sounding
-        uncertainty_included
-            if tvu exists, True
-        dest_path
-            output path to write to
+        Write the data to LAS format, see the module level _las_write
         """
-
-        try:  # xarray
-            x = np.round(x.values, 2)
-            y = np.round(y.values, 2)
-            z = np.round(z.values, 3)
-        except:  # numpy
-            x = np.round(x, 2)
-            y = np.round(y, 2)
-            z = np.round(z, 3)
-
-        try:
-            vlrs = [laspy.header.VLR(user_id='LASF_Projection', record_id=2112, description='OGC Coordinate System WKT',
-                                     record_data=self.fqpr.horizontal_crs.to_wkt().encode('utf-8'))]
-        except Exception as e:
-            print('_las_write: Unable to build the Coordinate System VLR: {}'.format(e))
-
-        try:  # pre laspy 2.0
-            hdr = laspy.header.Header(file_version=1.4, point_format=6)  # pt format 3 includes GPS time
-            hdr.x_scale = 0.01  # xyz precision, las stores data as int
-            hdr.y_scale = 0.01
-            hdr.z_scale = 0.001
-            # offset apparently used to store only differences, but you still write the actual value?  needs more understanding.
-            hdr.x_offset = np.floor(float(x.min()))
-            hdr.y_offset = np.floor(float(y.min()))
-            hdr.z_offset = np.floor(float(z.min()))
-
-            try:
-                hdr.vlrs = vlrs
-                hdr.wkt = 1
-            except Exception as e:
-                print('_las_write: Unable to set the Coordinate system to the Header VLR: {}'.format(e))
-
-            outfile = laspy.file.File(dest_path, mode='w', header=hdr)
-            outfile.x = x
-            outfile.y = y
-            outfile.z = z
-            if classification is not None:
-                classification[np.where(classification < 2)] = 1  # 1 = Unclassified according to LAS spec
-                classification[np.where(classification == 2)] = 7  # 7 = Low Point (noise) according to LAS spec
-                outfile.classification = classification.astype(np.int8)
-            # if uncertainty_included:  # putting it in Intensity for now as integer mm, Intensity is an int16 field
-            #     outfile.intensity = (uncertainty.values * 1000).astype(np.int16)
-
-            outfile.close()
-        except:  # the new way starting in 2.0
-            las = laspy.create(file_version="1.4", point_format=6)
-            las.header.offsets = [np.floor(float(x.min())), np.floor(float(y.min())), np.floor(float(z.min()))]
-            las.header.scales = [0.01, 0.01, 0.001]
-
-            try:
-                las.header.vlrs = vlrs
-                las.header.global_encoding.wkt = 1
-            except Exception as e:
-                print('_las_write: Unable to set the Coordinate system to the Header VLR: {}'.format(e))
-
-            las.x = x
-            las.y = y
-            las.z = z
-            if classification is not None:
-                classification[np.where(classification < 2)] = 1  # 1 = Unclassified according to LAS spec
-                classification[np.where(classification == 2)] = 7  # 7 = Low Point (noise) according to LAS spec
-                las.classification = classification.astype(np.int8)
-            if uncertainty_included:
-                pass
-                # this seems to work to build a file that is supported by laspy and LASTools, but not the QGIS-Entwine workflow
-                # las.add_extra_dim(laspy.ExtraBytesParams(name='uncertainty', type=np.float32,
-                #                                          description='Total Vertical Uncertainty'))
-                # las.uncertainty = uncertainty.values
-            las.write(dest_path)
+        _las_write(x, y, z, uncertainty, classification, uncertainty_included, dest_path, self.fqpr.horizontal_crs)
 
     def export_variable_to_csv(self, dataset_name: str, var_name: str, dest_path: str, reduce_method: str = None,
                                zero_centered: bool = False):
@@ -699,8 +572,7 @@ class FqprExport:
                         varray = varray.mean(axis=1)
                     except:
                         print('Export: Unable to reduce {} using algorithm {} during export'.format(var_name, reduce_method))
-                        varray = varray.stack({'sounding': ('time', 'beam')})
-                        vbeam = varray.beam.values
+                        vtime, vbeam, varray = _flatten_time_beam(varray)
                 elif reduce_method == 'nadir':
                     nadir_beam_num = int((varray.beam.shape[0] / 2) - 1)
                     varray = varray.isel(beam=nadir_beam_num)
@@ -710,14 +582,14 @@ class FqprExport:
                     last_beam_num = int((varray.beam.shape[0]) - 1)
                     varray = varray.isel(beam=last_beam_num)
                 else:
-                    varray = varray.stack({'sounding': ('time', 'beam')})
-                    vbeam = varray.beam.values
+                    vtime, vbeam, varray = _flatten_time_beam(varray)
             if zero_centered:
                 try:
                     varray = (varray - varray.mean())
                 except:
                     print('Export: Unable to zero center {}'.format(var_name))
-            vtime = varray.time.values
+            if vbeam is None:
+                vtime = varray.time.values
             varray = varray.values
             if os.path.exists(vpath):
                 vpath = os.path.splitext(vpath)[0] + '_{}.csv'.format(tstmp)
@@ -789,6 +661,409 @@ class FqprExport:
                        comments='')
 
 
+def _stacked_export_arrays(rp: xr.Dataset):
+    """
+    Pull the variables used in the sounding export out of the raw_ping dataset as 1d (stacked time/beam) numpy arrays.
+    We do this once per dataset, so that splitting the soundings by identifier is just indexing these arrays.
+
+    Parameters
+    ----------
+    rp
+        Dataset from FQPR for a sonar head, either (time, beam) or already stacked to a sounding dimension
+
+    Returns
+    -------
+    dict
+        dict of {variable name: 1d numpy array} for each of x, y, z, tvu, detectioninfo, frequency, txsector_beam that
+        exist in rp
+    """
+
+    varnames = [varname for varname in ['x', 'y', 'z', 'tvu', 'detectioninfo', 'frequency', 'txsector_beam'] if varname in rp]
+    # load all the variables in one compute, so that the scheduler walks the graph once instead of once per variable
+    loaded = dask.compute(*[rp[varname].data for varname in varnames])
+    # ravel of a (time, beam) array is the same order as stacking time/beam to sounding
+    return {varname: np.ravel(arr) for varname, arr in zip(varnames, loaded)}
+
+
+def _flatten_time_beam(varray: xr.DataArray):
+    """
+    Flatten a (time, beam) DataArray to one dimension, in the same order as stacking time/beam to a sounding dimension,
+    but without building the (time, beam) MultiIndex that stack creates for every sounding.
+
+    Parameters
+    ----------
+    varray
+        (time, beam) DataArray
+
+    Returns
+    -------
+    np.array
+        time value for each sounding
+    np.array
+        beam number for each sounding
+    xr.DataArray
+        1d DataArray of the values along the sounding dimension
+    """
+
+    vtime = np.repeat(varray.time.values, varray.beam.size)
+    vbeam = np.tile(varray.beam.values, varray.time.size)
+    return vtime, vbeam, xr.DataArray(np.ravel(varray.values), dims=['sounding'])
+
+
+def _split_by_identifiers(arrs: dict):
+    """
+    Split the stacked export arrays into one group for each frequency/sector combination.  Groups are built in one
+    O(N) pass (a counting sort on the combined frequency/sector key, see numba_helpers.group_indices) instead of
+    masking the full arrays for each combination.
+
+    Parameters
+    ----------
+    arrs
+        dict of {variable name: 1d numpy array}, see _stacked_export_arrays
+
+    Returns
+    -------
+    generator
+        yields (frequency, sector id, dict of {variable name: 1d numpy array} for the soundings in this group), sorted by
+        frequency and then sector, the soundings in each group are in their original order
+    """
+
+    freqs, freq_idx = np.unique(arrs['frequency'], return_inverse=True)
+    secs, sec_idx = np.unique(arrs['txsector_beam'], return_inverse=True)
+    key = freq_idx.ravel() * secs.size + sec_idx.ravel()
+    indices, offsets = group_indices(key, freqs.size * secs.size)
+    for grpkey in range(freqs.size * secs.size):
+        if offsets[grpkey + 1] == offsets[grpkey]:  # this frequency/sector combination does not exist
+            continue
+        idx = indices[offsets[grpkey]:offsets[grpkey + 1]]
+        yield freqs[grpkey // secs.size], int(secs[grpkey % secs.size]), {ky: arr[idx] for ky, arr in arrs.items()}
+
+
+def _generate_export_data(ping_dataset: Union[xr.Dataset, dict], filter_by_detection: bool = True, z_pos_down: bool = True):
+    """
+    Take the georeferenced data in the multibeam.raw_ping datasets held by fqpr_generation.Fqpr (ping_dataset is one of those
+    raw_ping datasets) and build the necessary arrays for exporting.
+
+    Parameters
+    ----------
+    ping_dataset
+        one of the multibeam.raw_ping xarray Datasets, must contain the x,y,z variables generated by georeferencing.
+        Can also be a dict of the stacked 1d numpy arrays for each variable, see _stacked_export_arrays
+    filter_by_detection
+        if True, will filter the xyz data by the detection info flag (rejected by multibeam system)
+    z_pos_down
+        if True, will export soundings with z positive down (this is the native Kluster convention)
+
+    Returns
+    -------
+    np.ndarray
+        x variable stacked in the time/beam dimension to create 1 dim representation.  rejected soundings removed
+        if filter_by_detection
+    np.ndarray
+        y variable stacked in the time/beam dimension to create 1 dim representation.  rejected soundings removed
+        if filter_by_detection
+    np.ndarray
+        z variable stacked in the time/beam dimension to create 1 dim representation.  rejected soundings removed
+        if filter_by_detection
+    np.ndarray
+        uncertainty variable stacked in the time/beam dimension to create 1 dim representation.  rejected soundings removed
+        if filter_by_detection
+    np.array
+        indexes of the original z data before stacking, used to unstack x
+    np.array
+        if detectioninfo exists, this is the integer classification for each sounding
+    np.array
+        if detectioninfo exists, boolean mask for the valid detections
+    bool
+        if tvu exists, True
+    """
+
+    uncertainty_included = False
+    nan_mask = ~np.isnan(np.asarray(ping_dataset['x']))
+    keep = nan_mask
+
+    # build mask with kongsberg detection info
+    classification = None
+    valid_detections = None
+    if 'detectioninfo' in ping_dataset:
+        dinfo = np.asarray(ping_dataset['detectioninfo'])
+        valid_dinfo = dinfo != 2
+        valid_detections = valid_dinfo[nan_mask]
+        if filter_by_detection:
+            # fold the detection filter into the nan mask, so that each variable is only indexed once
+            keep = nan_mask & valid_dinfo
+            tot = len(valid_detections)
+            tot_valid = np.count_nonzero(valid_detections)
+            print('{} total soundings, {} retained, {} filtered'.format(tot, tot_valid, tot - tot_valid))
+        classification = dinfo[keep]
+
+    # work with the numpy arrays from here on, DataArray indexing only adds coordinate overhead
+    x = np.asarray(ping_dataset['x'])[keep]
+    y = np.asarray(ping_dataset['y'])[keep]
+    z = np.asarray(ping_dataset['z'])[keep]
+    unc = None
+    if 'tvu' in ping_dataset:
+        uncertainty_included = True
+        unc = np.asarray(ping_dataset['tvu'])[keep]
+
+    # z positive down is the native convention in Kluster, if you want positive up, gotta flip
+    if not z_pos_down:
+        z = z * -1
+
+    return x, y, z, unc, nan_mask, classification, valid_detections, uncertainty_included
+
+
+def _csv_write(x: np.ndarray, y: np.ndarray, z: np.ndarray, uncertainty: np.ndarray,
+               uncertainty_included: bool, dest_path: str, delimiter: str):
+    """
+    Write the data to csv
+
+    Parameters
+    ----------
+    x
+        x variable stacked in the time/beam dimension to create 1 dim representation.  rejected soundings removed
+        if filter_by_detection
+    y
+        y variable stacked in the time/beam dimension to create 1 dim representation.  rejected soundings removed
+        if filter_by_detection
+    z
+        z variable stacked in the time/beam dimension to create 1 dim representation.  rejected soundings removed
+        if filter_by_detection
+    uncertainty
+        uncertainty variable stacked in the time/beam dimension to create 1 dim representation.  rejected soundings removed
+        if filter_by_detection
+    uncertainty_included
+        if tvu exists, True
+    dest_path
+        output path to write to
+    delimiter
+        csv delimiter to use
+    """
+
+    if uncertainty_included:
+        cols = [x, y, z, uncertainty]
+        fmt = ['%3.3f', '%2.3f', '%4.3f', '%4.3f']
+        header = 'easting{}northing{}depth{}uncertainty'.format(delimiter, delimiter, delimiter)
+    else:
+        cols = [x, y, z]
+        fmt = ['%3.3f', '%2.3f', '%4.3f']
+        header = 'easting{}northing{}depth'.format(delimiter, delimiter)
+
+    col_extents = np.abs([nan_min_max_mean(col)[:2] for col in cols])
+    if np.any(col_extents >= 2 ** 52 / 1000):  # beyond what the numba formatter can round exactly (or inf)
+        np.savetxt(dest_path, np.column_stack(cols), fmt=fmt, delimiter=delimiter, header=header, comments='')
+    else:
+        # same text as np.savetxt with the fmt above, formatted in numba instead of value by value in Python
+        #  rows are formatted in blocks of csv_write_chunksize, each block is copied column by column into a reused
+        #  float64 buffer, formatted into one contiguous byte buffer and written with one write call
+        widths = np.array([int(f[1]) for f in fmt])
+        delim = np.frombuffer(delimiter.encode(), dtype=np.uint8)
+        block = _scratch_buffer('csv_block', min(len(x), csv_write_chunksize) * len(cols), np.float64)
+        with open(dest_path, 'wb') as csvfile:
+            csvfile.write((header + '\n').encode())
+            for start in range(0, len(x), csv_write_chunksize):
+                end = min(start + csv_write_chunksize, len(x))
+                data = block[:(end - start) * len(cols)].reshape(end - start, len(cols))
+                for cnt, col in enumerate(cols):
+                    data[:, cnt] = col[start:end]
+                csvfile.write(format_fixed_point_csv(data, 3, widths, delim))
+
+
+def _las_write(x: np.ndarray, y: np.ndarray, z: np.ndarray, uncertainty: np.ndarray,
+               classification: np.array, uncertainty_included: bool, dest_path: str, horizontal_crs=None):
+    """
+    Write the data to LAS format
+
+    Parameters
+    ----------
+    x
+        x variable stacked in the time/beam dimension to create 1 dim representation.  rejected soundings removed
+        if filter_by_detection
+    y
+        y variable stacked in the time/beam dimension to create 1 dim representation.  rejected soundings removed
+        if filter_by_detection
+    z
+        z variable stacked in the time/beam dimension to create 1 dim representation.  rejected soundings removed
+        if filter_by_detection
+    uncertainty
+        uncertainty variable stacked in the time/beam dimension to create 1 dim representation.  rejected soundings removed
+        if filter_by_detection
+    classification
+        if detectioninfo exists, this is the integer classification for each sounding
+    uncertainty_included
+        if tvu exists, True
+    dest_path
+        output path to write to
+    horizontal_crs
+        pyproj CRS of the x/y data, written to the file as the WKT coordinate system VLR
+    """
+
+    # rounding is monotonic, so the min of the rounded values is the rounded min
+    minx, miny, minz = xyz_minima(x, y, z)
+    offsets = [np.floor(np.round(minx, 2)), np.floor(np.round(miny, 2)), np.floor(np.round(minz, 3))]
+    if classification is not None:
+        classification = np.take(las_classification_lut, classification.astype(np.int64), mode='clip')
+
+    try:
+        vlrs = [laspy.header.VLR(user_id='LASF_Projection', record_id=2112, description='OGC Coordinate System WKT',
+                                 record_data=horizontal_crs.to_wkt().encode('utf-8'))]
+    except Exception as e:
+        print('_las_write: Unable to build the Coordinate System VLR: {}'.format(e))
+
+    try:  # pre laspy 2.0
+        hdr = laspy.header.Header(file_version=1.4, point_format=6)  # pt format 3 includes GPS time
+        hdr.x_scale = 0.01  # xyz precision, las stores data as int
+        hdr.y_scale = 0.01
+        hdr.z_scale = 0.001
+        # offset apparently used to store only differences, but you still write the actual value?  needs more understanding.
+        hdr.x_offset = offsets[0]
+        hdr.y_offset = offsets[1]
+        hdr.z_offset = offsets[2]
+
+        try:
+            hdr.vlrs = vlrs
+            hdr.wkt = 1
+        except Exception as e:
+            print('_las_write: Unable to set the Coordinate system to the Header VLR: {}'.format(e))
+
+        outfile = laspy.file.File(dest_path, mode='w', header=hdr)
+        outfile.X = _las_scaled_integers(x, offsets[0], 2)
+        outfile.Y = _las_scaled_integers(y, offsets[1], 2)
+        outfile.Z = _las_scaled_integers(z, offsets[2], 3)
+        if classification is not None:
+            outfile.classification = classification
+        # if uncertainty_included:  # putting it in Intensity for now as integer mm, Intensity is an int16 field
+        #     outfile.intensity = (uncertainty.values * 1000).astype(np.int16)
+
+        outfile.close()
+    except:  # the new way starting in 2.0
+        hdr = laspy.LasHeader(version="1.4", point_format=6)
+        hdr.offsets = offsets
+        hdr.scales = [0.01, 0.01, 0.001]
+
+        try:
+            hdr.vlrs = vlrs
+            hdr.global_encoding.wkt = 1
+        except Exception as e:
+            print('_las_write: Unable to set the Coordinate system to the Header VLR: {}'.format(e))
+
+        if uncertainty_included:
+            pass
+            # this seems to work to build a file that is supported by laspy and LASTools, but not the QGIS-Entwine workflow
+            # hdr.add_extra_dim(laspy.ExtraBytesParams(name='uncertainty', type=np.float32,
+            #                                          description='Total Vertical Uncertainty'))
+        # write the points in chunks, so that we only ever have one chunk of rounded/scaled points in memory
+        with laspy.open(dest_path, mode='w', header=hdr) as outfile:
+            for start in range(0, len(x), las_write_chunksize):
+                end = min(start + las_write_chunksize, len(x))
+                points = laspy.ScaleAwarePointRecord.zeros(end - start, header=hdr)
+                # the scaled integers are copied into the point record, so one pair of scratch buffers serves all three
+                scaled = _scratch_buffer('las_scaled', end - start, np.float64)
+                scaled_int = _scratch_buffer('las_scaled_int', end - start, np.int32)
+                points.X = _las_scaled_integers(x[start:end], offsets[0], 2, scaled, scaled_int)
+                points.Y = _las_scaled_integers(y[start:end], offsets[1], 2, scaled, scaled_int)
+                points.Z = _las_scaled_integers(z[start:end], offsets[2], 3, scaled, scaled_int)
+                if classification is not None:
+                    points.classification = classification[start:end]
+                # if uncertainty_included:
+                #     points.uncertainty = uncertainty[start:end]
+                outfile.write_points(points)
+
+
+def _las_scaled_integers(arr: np.ndarray, offset: float, decimals: int, scratch: np.ndarray = None, out: np.ndarray = None):
+    """
+    Build the scaled integer coordinates that the las point record stores, (value - offset) / scale with
+    scale = 10 ** -decimals.  Rounding to the given number of decimals and scaling are done in one step here, so that
+    laspy does not have to scale the rounded float values again.
+
+    Parameters
+    ----------
+    arr
+        1d array of x, y or z values
+    offset
+        the las header offset for this coordinate, a whole number
+    decimals
+        number of decimals to keep, 2 for x/y and 3 for z in the kluster las export
+    scratch
+        optional float64 array the same length as arr, used for the intermediate scaled values instead of allocating
+    out
+        optional int32 array the same length as arr to write the result to instead of allocating
+
+    Returns
+    -------
+    np.ndarray
+        int32 scaled coordinates
+    """
+
+    scl = 10 ** decimals
+    scaled = np.multiply(arr, scl, out=scratch)
+    np.rint(scaled, out=scaled)  # same rounding as np.round(arr, decimals)
+    scaled -= offset * scl
+    if out is None:
+        return scaled.astype(np.int32)
+    np.copyto(out, scaled, casting='unsafe')
+    return out
+
+
+def _scratch_buffer(name: str, size: int, dtype: np.dtype):
+    """
+    Return a 1d buffer of size elements for the current thread, reusing the buffer from the last call with this name
+    if it is big enough.  Lets the per sector csv/las writes reuse the same working memory instead of allocating it for
+    every file.  Buffers are per thread, as dask workers can run several sector writes at once.
+
+    Parameters
+    ----------
+    name
+        identifier for the buffer
+    size
+        number of elements needed
+    dtype
+        numpy dtype of the buffer
+
+    Returns
+    -------
+    np.ndarray
+        1d uninitialized array of length size
+    """
+
+    buffers = getattr(_scratch_buffers, 'buffers', None)
+    if buffers is None:  # first call in this thread
+        buffers = _scratch_buffers.buffers = {}
+    buf = buffers.get(name)
+    if buf is None or buf.size < size or buf.dtype != dtype:
+        buf = np.empty(size, dtype=dtype)
+        buffers[name] = buf
+    return buf[:size]
+
+
+def _distrib_export_sector(data: list):
+    """
+    Convenience function for exporting one frequency/sector group of soundings to file, built to be mapped to the dask
+    cluster.
+
+    Parameters
+    ----------
+    data
+        [dict of {variable name: 1d numpy array} for the soundings in this group (see _split_by_identifiers),
+        output file path, file format ('csv' or 'las'), filter_by_detection, z_pos_down, csv delimiter,
+        horizontal crs for the las coordinate system VLR]
+
+    Returns
+    -------
+    str
+        the written file path
+    """
+
+    sec_subset_rp, dest_path, file_format, filter_by_detection, z_pos_down, csv_delimiter, horizontal_crs = data
+    x, y, z, unc, _, classification, _, uncertainty_included = _generate_export_data(sec_subset_rp, filter_by_detection=filter_by_detection,
+                                                                                      z_pos_down=z_pos_down)
+    if file_format == 'csv':
+        _csv_write(x, y, z, unc, uncertainty_included, dest_path, csv_delimiter)
+    else:
+        _las_write(x, y, z, unc, classification, uncertainty_included, dest_path, horizontal_crs)
+    return dest_path
+
+
 def _create_folder(output_directory, fldrname):
     tstmp = datetime.now().strftime('%Y%m%d_%H%M%S')
     try:
@@ -162,6 +162,366 @@ def is_inside_sm_parallel(points, polygon):
     return D
 
 
+@numba.njit(nogil=True, parallel=True, fastmath=True)
+def rotate_xy(x: np.array, y: np.array, cos_az: float, sin_az: float, rotx: np.array, roty: np.array):
+    """
+    Rotate the x, y coordinates by the angle with the given cosine/sine, writing the result to the provided rotx, roty
+    arrays.  Done in a single pass over x and y without building any temporary arrays.
+
+    rotx = cos_az * x - sin_az * y
+    roty = sin_az * x + cos_az * y
+
+    Parameters
+    ----------
+    x
+        numpy array, 1d x value
+    y
+        numpy array, 1d y value
+    cos_az
+        cosine of the rotation angle
+    sin_az
+        sine of the rotation angle
+    rotx
+        numpy array, 1d destination for the rotated x value, same length as x
+    roty
+        numpy array, 1d destination for the rotated y value, same length as x
+    """
+
+    for i in numba.prange(x.shape[0]):
+        xi = x[i]
+        yi = y[i]
+        rotx[i] = cos_az * xi - sin_az * yi
+        roty[i] = sin_az * xi + cos_az * yi
+
+
+@numba.njit(nogil=True, parallel=True)
+def nan_min_max_mean(arr: np.array, chunk_size: int = 65536):
+    """
+    Equivalent to (np.nanmin(arr), np.nanmax(arr), np.nanmean(arr)), but built in a single pass over the array.  Each
+    chunk of chunk_size elements gets its own min/max/sum/count accumulators (so the prange loop has no shared state),
+    which are then reduced at the end.
+
+    Not built with fastmath, fastmath lets the compiler assume there are no nans, which drops the nan check.
+
+    Parameters
+    ----------
+    arr
+        numpy array, 1d array of any numeric dtype
+    chunk_size
+        number of elements each parallel chunk covers
+
+    Returns
+    -------
+    float
+        minimum of the non-nan values, nan if there are none
+    float
+        maximum of the non-nan values, nan if there are none
+    float
+        mean of the non-nan values, nan if there are none
+    """
+
+    n = arr.shape[0]
+    nchunks = (n + chunk_size - 1) // chunk_size
+    mins = np.full(nchunks, np.inf)
+    maxs = np.full(nchunks, -np.inf)
+    sums = np.zeros(nchunks)
+    counts = np.zeros(nchunks, dtype=np.int64)
+    for c in numba.prange(nchunks):
+        cmin = np.inf
+        cmax = -np.inf
+        csum = 0.0
+        ccount = 0
+        for i in range(c * chunk_size, min(n, (c + 1) * chunk_size)):
+            val = float(arr[i])
+            if val == val:
+                if val < cmin:
+                    cmin = val
+                if val > cmax:
+                    cmax = val
+                csum += val
+                ccount += 1
+        mins[c] = cmin
+        maxs[c] = cmax
+        sums[c] = csum
+        counts[c] = ccount
+
+    count = counts.sum()
+    if count == 0:
+        return np.nan, np.nan, np.nan
+    return mins.min(), maxs.max(), sums.sum() / count
+
+
+@numba.njit(nogil=True, parallel=True)
+def xyz_minima(x: np.array, y: np.array, z: np.array, chunk_size: int = 65536):
+    """
+    Equivalent to (np.nanmin(x), np.nanmin(y), np.nanmin(z)) for three arrays of the same length, built in one pass
+    over the three arrays instead of three.  Same per chunk accumulators as nan_min_max_mean.
+
+    Parameters
+    ----------
+    x
+        numpy array, 1d array of any numeric dtype
+    y
+        numpy array, 1d array of the same length as x
+    z
+        numpy array, 1d array of the same length as x
+    chunk_size
+        number of elements each parallel chunk covers
+
+    Returns
+    -------
+    float
+        minimum of the non-nan x values, nan if there are none
+    float
+        minimum of the non-nan y values, nan if there are none
+    float
+        minimum of the non-nan z values, nan if there are none
+    """
+
+    n = x.shape[0]
+    nchunks = (n + chunk_size - 1) // chunk_size
+    mins = np.full((nchunks, 3), np.inf)
+    for c in numba.prange(nchunks):
+        xmin = np.inf
+        ymin = np.inf
+        zmin = np.inf
+        for i in range(c * chunk_size, min(n, (c + 1) * chunk_size)):
+            xval = float(x[i])
+            yval = float(y[i])
+            zval = float(z[i])
+            if xval < xmin:  # comparisons with nan are always False, so nans are skipped
+                xmin = xval
+            if yval < ymin:
+                ymin = yval
+            if zval < zmin:
+                zmin = zval
+        mins[c, 0] = xmin
+        mins[c, 1] = ymin
+        mins[c, 2] = zmin
+
+    final = np.full(3, np.nan)
+    if nchunks:
+        for j in range(3):
+            final[j] = mins[:, j].min()
+            if final[j] == np.inf:  # no non-nan values
+                final[j] = np.nan
+    return final[0], final[1], final[2]
+
+
+@numba.njit(nogil=True, parallel=True, error_model='numpy')
+def lut_colors(vals: np.array, minval: float, maxval: float, lut: np.ndarray, out: np.ndarray):
+    """
+    Color each value by binning it between minval and maxval into the rows of a colormap lookup table, writing the
+    colors to the provided out array.  Binning follows matplotlib, (value - minval) / (maxval - minval) * bands floored
+    and clipped to the end bands.  Nan values get the last row of the lookup table (the colormap 'bad' color).
+
+    Parameters
+    ----------
+    vals
+        numpy array, 1d array of values to color
+    minval
+        value that maps to the first band
+    maxval
+        value that maps to the last band
+    lut
+        numpy array, (bands + 1, 4) colormap lookup table, the last row is the color for nan values
+    out
+        numpy array, (N, 4) destination for the colors, same length as vals
+    """
+
+    bands = lut.shape[0] - 1
+    scale = bands / (maxval - minval)
+    for i in numba.prange(vals.shape[0]):
+        t = (float(vals[i]) - minval) * scale
+        if t != t:
+            k = bands
+        elif t < 0:
+            k = 0
+        elif t > bands - 1:
+            k = bands - 1
+        else:
+            k = int(t)
+        for j in range(4):
+            out[i, j] = lut[k, j]
+
+
+@numba.njit(nogil=True)
+def _round_fixed_point(val: float, scale: float):
+    """
+    Round the exact product val * scale to the nearest integer, ties to even.  val * scale in floating point can
+    round onto (or off of) a tie, so we carry the rounding error of the product (Dekker two product) to make the same
+    decision printf/Python formatting makes on the exact binary value.  val must be positive and val * scale < 2**52.
+    """
+
+    prod = val * scale
+    c = 134217729.0 * val
+    val_hi = c - (c - val)
+    val_lo = val - val_hi
+    c = 134217729.0 * scale
+    scale_hi = c - (c - scale)
+    scale_lo = scale - scale_hi
+    err = ((val_hi * scale_hi - prod) + val_hi * scale_lo + val_lo * scale_hi) + val_lo * scale_lo
+    rounded = np.floor(prod)
+    diff = (prod - rounded) - 0.5
+    if diff > 0 or (diff == 0 and err > 0):
+        rounded += 1
+    elif diff == 0 and err == 0 and rounded % 2 == 1:
+        rounded += 1
+    return np.int64(rounded)
+
+
+@numba.njit(nogil=True)
+def _fixed_point_text(val: float, scale: float, decimals: int, out: np.array, pos: int):
+    """
+    Write val as fixed point text with the given number of decimals (the '%.3f' format) to out starting at pos, or just
+    count the characters if out is empty.  Returns the position after the last character.
+    """
+
+    write = out.shape[0] > 0
+    if val != val:
+        if write:
+            out[pos] = 110  # n
+            out[pos + 1] = 97  # a
+            out[pos + 2] = 110  # n
+        return pos + 3
+    if np.copysign(1.0, val) < 0:
+        if write:
+            out[pos] = 45  # -
+        pos += 1
+        val = -val
+    if val == np.inf:
+        if write:
+            out[pos] = 105  # i
+            out[pos + 1] = 110  # n
+            out[pos + 2] = 102  # f
+        return pos + 3
+    rounded = _round_fixed_point(val, scale)
+    intpart = rounded // np.int64(scale)
+    ndigits = 1
+    tmp = intpart // 10
+    while tmp > 0:
+        ndigits += 1
+        tmp //= 10
+    end = pos + ndigits + 1 + decimals
+    if write:
+        idx = end - 1
+        for _ in range(decimals):
+            out[idx] = 48 + rounded % 10
+            rounded //= 10
+            idx -= 1
+        out[idx] = 46  # .
+        idx -= 1
+        for _ in range(ndigits):
+            out[idx] = 48 + intpart % 10
+            intpart //= 10
+            idx -= 1
+    return end
+
+
+@numba.njit(nogil=True, parallel=True)
+def format_fixed_point_csv(arr: np.ndarray, decimals: int, widths: np.array, delimiter: np.array):
+    """
+    Format a 2d array as delimited text rows, each value written as fixed point with the given number of decimals.
+    Produces the same text as np.savetxt(fmt=['%<width>.<decimals>f', ...]) for the rows, without going through
+    Python string formatting for each value.  Rows are sized in one parallel pass and written in a second.
+
+    All finite values must be less than 2**52 / 10**decimals in magnitude, see _round_fixed_point.
+
+    Parameters
+    ----------
+    arr
+        numpy array, (rows, columns) float64 array to format
+    decimals
+        number of decimal places to write for each value
+    widths
+        numpy array, minimum width of each column, shorter values are padded with spaces on the left
+    delimiter
+        numpy array, uint8 encoded delimiter to write between columns
+
+    Returns
+    -------
+    np.array
+        uint8 array of the encoded text, each row terminated with a newline
+    """
+
+    nrows, ncols = arr.shape
+    scale = 10.0 ** decimals
+    nodata = np.empty(0, dtype=np.uint8)
+    rowlength = np.empty(nrows, dtype=np.int64)
+    for i in numba.prange(nrows):
+        pos = 0
+        for j in range(ncols):
+            pos += max(_fixed_point_text(arr[i, j], scale, decimals, nodata, 0), widths[j])
+        rowlength[i] = pos + (ncols - 1) * delimiter.shape[0] + 1
+    rowstart = np.zeros(nrows + 1, dtype=np.int64)
+    rowstart[1:] = np.cumsum(rowlength)
+    out = np.empty(rowstart[-1], dtype=np.uint8)
+    for i in numba.prange(nrows):
+        pos = rowstart[i]
+        for j in range(ncols):
+            if j:
+                for k in range(delimiter.shape[0]):
+                    out[pos + k] = delimiter[k]
+                pos += delimiter.shape[0]
+            for k in range(widths[j] - _fixed_point_text(arr[i, j], scale, decimals, nodata, 0)):
+                out[pos] = 32  # space
+                pos += 1
+            pos = _fixed_point_text(arr[i, j], scale, decimals, out, pos)
+        out[pos] = 10  # newline
+    return out
+
+
+@numba.njit(nogil=True, parallel=True)
+def group_indices(keys: np.array, n_groups: int, chunk_size: int = 65536):
+    """
+    Counting sort of the array indices by group key, the O(N) equivalent of np.argsort(keys, kind='stable').  Each
+    chunk of chunk_size elements counts its own group sizes, the counts are prefix summed to get the slot each chunk
+    starts at in each group, and then each chunk scatters its indices into its slots.  No shared state in the prange
+    loops and the original order is kept within each group.
+
+    Parameters
+    ----------
+    keys
+        numpy array, 1d array of integer group keys, each in [0, n_groups)
+    n_groups
+        number of possible group keys
+    chunk_size
+        number of elements each parallel chunk covers
+
+    Returns
+    -------
+    np.array
+        1d int64 array of the indices of keys, grouped by key.  indices[offsets[g]:offsets[g + 1]] are the indices of
+        the elements with key g
+    np.array
+        1d int64 array of length n_groups + 1, the start of each group in indices
+    """
+
+    n = keys.shape[0]
+    nchunks = (n + chunk_size - 1) // chunk_size
+    counts = np.zeros((nchunks, n_groups), dtype=np.int64)
+    for c in numba.prange(nchunks):
+        for i in range(c * chunk_size, min(n, (c + 1) * chunk_size)):
+            counts[c, keys[i]] += 1
+
+    offsets = np.zeros(n_groups + 1, dtype=np.int64)
+    slots = np.empty((nchunks, n_groups), dtype=np.int64)
+    pos = 0
+    for g in range(n_groups):
+        offsets[g] = pos
+        for c in range(nchunks):
+            slots[c, g] = pos
+            pos += counts[c, g]
+    offsets[n_groups] = pos
+
+    indices = np.empty(n, dtype=np.int64)
+    for c in numba.prange(nchunks):
+        for i in range(c * chunk_size, min(n, (c + 1) * chunk_size)):
+            indices[slots[c, keys[i]]] = i
+            slots[c, keys[i]] += 1
+    return indices, offsets
+
+
 if __name__ == '__main__':
     x = np.random.uniform(0, 100, size=1000000)
     x_bins = np.arange(100)
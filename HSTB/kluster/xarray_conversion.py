@@ -1,4 +1,5 @@
 import os
+import bisect
 from glob import glob
 from dask.distributed import Client, Future, progress
 import webbrowser
@@ -64,6 +65,29 @@ install_parameter_modifier = {'em2040_dual_tx': {'rx_port': {'0': {'x': 0.011, '
                               }
 
 
+def _np_is_bit_set(arr: np.ndarray, bitpos: int):
+    """
+    Check if bit is set using the numpy array of integer flags and bit position.  Returns True where set.
+
+    Parameters
+    ----------
+    arr
+        numpy array containing binary flag as integer, floats will be cast to integer
+    bitpos
+        integer offset representing bit posititon (3 to check 3rd bit)
+
+    Returns
+    -------
+    np.ndarray
+        boolean array, True where bitpos bit is set in arr
+    """
+
+    arr = np.asarray(arr)
+    if not np.issubdtype(arr.dtype, np.integer):
+        arr = arr.astype(int)
+    return np.bitwise_and(arr, 1 << (bitpos - 1)) != 0
+
+
 def _xarr_is_bit_set(da: xr.DataArray, bitpos: int):
     """
     Check if bit is set using the Xarray DataArray and bit position.  Returns True if set.
@@ -77,18 +101,12 @@ def _xarr_is_bit_set(da: xr.DataArray, bitpos: int):
 
     Returns
     -------
-    bool
+    xr.DataArray
         True if bitpos bit is set in val
     """
 
-    try:
-        # get integer value from bitpos and return True if set in num
-        chk = da & (1 << (bitpos - 1))
-    except TypeError:
-        # won't work on dask arrays or floats, compute to get numpy
-        chk = da.compute().astype(int) & (1 << (bitpos-1))
-
-    return chk.astype(bool)
+    # works on the underlying numpy data (computing dask arrays), only wrap the final mask
+    return xr.DataArray(_np_is_bit_set(da.values, bitpos), coords=da.coords, dims=da.dims, name=da.name)
 
 
 def _run_sequential_read(fildata: list):
@@ -142,14 +160,12 @@ def _build_serial_mask(rec: dict):
         index of where each sector_id identifier shows up in the data
     """
 
-    serial_nums = list(np.unique(rec['ping']['serial_num']))
-    sector_ids = []
-    id_mask = []
-
-    for x in serial_nums:
-        ser_mask = np.where(rec['ping']['serial_num'] == float(x))[0]
-        sector_ids.append(str(x))
-        id_mask.append(ser_mask)
+    serial_nums, serial_idx = np.unique(rec['ping']['serial_num'], return_inverse=True)
+    serial_idx = serial_idx.ravel()
+    sector_ids = [str(x) for x in serial_nums]
+    # one stable sort groups the indices by serial number (in order) instead of a full comparison per serial number
+    counts = np.bincount(serial_idx, minlength=len(serial_nums))
+    id_mask = np.split(np.argsort(serial_idx, kind='stable'), np.cumsum(counts)[:-1]) if sector_ids else []
     return sector_ids, id_mask
 
 
@@ -554,42 +570,21 @@ def _return_xarray_constant_blocks(xlens: list, xarrfutures: list, rec_length: i
         total number of time values across all chunks
     """
 
+    # start/end of each array along the concatenated time dimension, and the start/end of each block
+    bounds = np.concatenate([[0], np.cumsum(xlens, dtype=np.int64)])
+    totallen = int(bounds[-1])
+    if not totallen:
+        return [[[0, 0, xarr] for xarr in xarrfutures]], totallen
+    blk_starts = np.arange(0, totallen, rec_length)
+    blk_ends = np.minimum(blk_starts + rec_length, totallen)
+    # index of the first/last array in each block, side='right' skips over any zero length arrays
+    first_arr = np.searchsorted(bounds, blk_starts, side='right') - 1
+    last_arr = np.searchsorted(bounds, blk_ends - 1, side='right') - 1
+
     newxarrs = []
-    cur_req = rec_length
-    bufr = []
-    totallen = 0
-    for ct, l in enumerate(xlens):
-        # range angle length from this worker/future
-        arrlen = l
-        # Just in case you get to zero, start over
-        if cur_req == 0:
-            newxarrs.append(bufr)
-            bufr = []
-            cur_req = rec_length
-        # if the length of the rec is less than the desired blocksize,
-        #    add it to the buffer and move on
-        if arrlen <= cur_req:
-            bufr.append([0, arrlen, xarrfutures[ct]])
-            totallen += arrlen
-            cur_req -= arrlen
-        # if the length is greater than blocksize, add enough to get blocksize
-        #    and attach the rest to overflow for the next block
-        elif arrlen > cur_req:
-            start_idx = 0
-            while arrlen > cur_req:
-                bufr.append([start_idx, cur_req, xarrfutures[ct]])
-                newxarrs.append(bufr)
-                bufr = []
-                totallen += cur_req - start_idx
-                start_idx = cur_req
-                cur_req += rec_length
-            if start_idx:
-                cur_req -= rec_length
-
-            bufr = [[cur_req, arrlen, xarrfutures[ct]]]
-            totallen += (arrlen - cur_req)
-            cur_req = rec_length - (arrlen - cur_req)
-    newxarrs.append(bufr)
+    for blk_start, blk_end, first, last in zip(blk_starts.tolist(), blk_ends.tolist(), first_arr.tolist(), last_arr.tolist()):
+        newxarrs.append([[max(blk_start, int(bounds[i])) - int(bounds[i]), min(blk_end, int(bounds[i + 1])) - int(bounds[i]), xarrfutures[i]]
+                         for i in range(first, last + 1) if bounds[i + 1] > bounds[i]])
     return newxarrs, totallen
 
 
@@ -627,13 +622,14 @@ def _merge_constant_blocks(newblocks: list):
     """
     xarrs = [i[2].isel(time=slice(i[0], i[1])) for i in newblocks]
     finalarr = xr.combine_nested(xarrs, 'time')
+    # blocks are generally already in time order, only sort (which copies every variable) if we need to
+    if not finalarr.indexes['time'].is_monotonic_increasing:
+        finalarr = finalarr.sortby('time')
     # can't have duplicate times in xarray dataset, apply tiny offset in time to handle this
-    finalarr = finalarr.sortby('time')
-    duptimes = np.where(np.diff(finalarr.time) == 0)[0]
-    if duptimes:
-        newtimes = finalarr.time.values
-        for dupt in duptimes:
-            newtimes[dupt + 1] += 0.000001
+    duptimes = np.where(np.diff(finalarr.time.values) == 0)[0]
+    if duptimes.size:
+        newtimes = finalarr.time.values.copy()
+        newtimes[duptimes + 1] += 0.000001
         finalarr = finalarr.assign_coords(time=newtimes)
     return finalarr
 
@@ -774,16 +770,15 @@ def _closest_prior_key_value(tstmps: list, key: float):
     """
 
     try:
-        sett_tims = np.array([float(x) for x in tstmps])
+        sett_tims = sorted([float(x) for x in tstmps])
     except ValueError:
         print('Unable to generate list of floats from: {}'.format(tstmps))
         return None
 
-    tim = float(key)
-    difs = tim - sett_tims
-    difs[difs < 0] = np.nan
-    closest_tim = sett_tims[np.nanargmin(difs)]
-    return closest_tim
+    idx = bisect.bisect_right(sett_tims, float(key)) - 1
+    if idx < 0:
+        raise ValueError('_closest_prior_key_value: no timestamp found prior to {}'.format(key))
+    return sett_tims[idx]
 
 
 def _closest_key_value(tstmps: list, key: float):
@@ -804,15 +799,18 @@ def _closest_key_value(tstmps: list, key: float):
     """
 
     try:
-        sett_tims = np.array([float(x) for x in tstmps])
+        sett_tims = sorted([float(x) for x in tstmps])
     except ValueError:
         print('Unable to generate list of floats from: {}'.format(tstmps))
         return None
+    if not sett_tims:
+        raise ValueError('_closest_key_value: no timestamps provided')
 
     tim = float(key)
-    difs = abs(tim - sett_tims)
-    closest_tim = sett_tims[np.nanargmin(difs)]
-    return closest_tim
+    idx = bisect.bisect_left(sett_tims, tim)
+    # the closest is either side of the insertion point, take the earlier one on a tie
+    candidates = sett_tims[max(idx - 1, 0):idx + 1]
+    return min(candidates, key=lambda x: abs(tim - x))
 
 
 def batch_read_configure_options():
@@ -30,3 +30,61 @@ def test_hist2d_numba_seq():
     hist2d = hist2d_numba_seq(x, y, bins, ranges)
 
     assert np.array_equal(hist2d, np.array([[5., 0.], [0., 5.]]))
+
+
+def test_rotate_xy():
+    x = np.array([1.0, 0.0, 2.0])
+    y = np.array([0.0, 1.0, 2.0])
+    rotx = np.zeros(3)
+    roty = np.zeros(3)
+
+    rotate_xy(x, y, np.cos(np.pi / 2), np.sin(np.pi / 2), rotx, roty)
+
+    assert np.allclose(rotx, np.array([0.0, -1.0, -2.0]))
+    assert np.allclose(roty, np.array([1.0, 0.0, 2.0]))
+
+
+def test_nan_min_max_mean():
+    x = np.array([3.0, np.nan, -1.0, 4.0, np.nan, 2.0])
+    # small chunk size to exercise the reduction across chunks
+    assert np.allclose(nan_min_max_mean(x, 4), (-1.0, 4.0, 2.0))
+    assert np.allclose(nan_min_max_mean(np.array([5, 1, 3], dtype=np.uint16)), (1.0, 5.0, 3.0))
+    assert np.all(np.isnan(nan_min_max_mean(np.array([np.nan, np.nan]))))
+
+
+def test_lut_colors():
+    lut = np.array([[0, 0, 0, 1], [0.5, 0.5, 0.5, 1], [1, 1, 1, 1], [0, 0, 0, 0]], dtype=np.float32)
+    vals = np.array([0.0, 10.0, 5.0, 3.0, -4.0, 20.0, np.nan])
+    out = np.zeros((vals.shape[0], 4), dtype=np.float32)
+
+    lut_colors(vals, 0.0, 10.0, lut, out)
+
+    assert np.array_equal(out, lut[[0, 2, 1, 0, 0, 2, 3]])
+
+
+def test_format_fixed_point_csv():
+    arr = np.array([[1.0005, -2.5, np.nan], [123456.789, -0.0, np.inf]])
+    txt = format_fixed_point_csv(arr, 3, np.array([3, 2, 4]), np.frombuffer(b',', dtype=np.uint8)).tobytes()
+    expected = '\n'.join([','.join(f % v for f, v in zip(['%3.3f', '%2.3f', '%4.3f'], row)) for row in arr]) + '\n'
+    assert txt == expected.encode()
+
+
+def test_group_indices():
+    keys = np.array([2, 0, 2, 1, 0, 2, 2])
+    # small chunk size to exercise the scatter across chunks
+    indices, offsets = group_indices(keys, 4, 3)
+
+    assert np.array_equal(indices, np.argsort(keys, kind='stable'))
+    assert np.array_equal(offsets, np.array([0, 2, 3, 7, 7]))
+
+
+def test_xyz_minima():
+    x = np.array([3.0, np.nan, -1.0, 4.0, 2.0])
+    y = np.array([np.nan, 5.0, 6.0, 1.0, 7.0])
+    z = np.full(5, np.nan)
+    # small chunk size to exercise the reduction across chunks
+    minx, miny, minz = xyz_minima(x, y, z, 2)
+
+    assert minx == -1.0
+    assert miny == 1.0
+    assert np.isnan(minz)
@@ -2,9 +2,11 @@ import os
 from copy import deepcopy
 
 from HSTB.kluster.fqpr_vessel import VesselFile, get_overlapping_timestamps, compare_dict_data, carry_over_optional, \
-    create_new_vessel_file, only_retain_earliest_entry, convert_from_fqpr_xyzrph, convert_from_vessel_xyzrph
+    create_new_vessel_file, only_retain_earliest_entry, convert_from_fqpr_xyzrph, convert_from_vessel_xyzrph, \
+    copy_timestamped_data
 
 
+test_data_folder = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'test_data')
 test_xyzrph = {'antenna_x': {'1626354881': '0.000'}, 'antenna_y': {'1626354881': '0.000'},
                'antenna_z': {'1626354881': '0.000'}, 'imu_h': {'1626354881': '0.000'},
                'latency': {'1626354881': '0.000'}, 'imu_p': {'1626354881': '0.000'},
@@ -38,7 +40,7 @@ def get_test_vesselfile():
         absolute file path to the test file
     """
 
-    testfile = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'test_data', 'vessel_file.kfc')
+    testfile = os.path.join(test_data_folder, 'vessel_file.kfc')
     return testfile
 
 
@@ -134,6 +136,22 @@ def test_return_singletimestamp():
     assert new_data == {'beam_opening_angle': {"1234": 1.0}, 'rx_x': {"1234": 0.345}}
 
 
+def test_return_data_after_data_changes():
+    vf = VesselFile()
+    vf.update('123', {'beam_opening_angle': {"1234": 1.0}, 'rx_x': {"1234": 0.345}})
+    assert vf.return_data('123', 1300, 1400) == {'beam_opening_angle': {"1234": 1.0}, 'rx_x': {"1234": 0.345}}
+    # new timestamps added with update are picked up by the next query
+    vf.update('123', {'beam_opening_angle': {"1290": 2.0}, 'rx_x': {"1290": 0.5}}, carry_over_tpu=False)
+    assert vf.return_data('123', 1300, 1400) == {'beam_opening_angle': {"1290": 2.0}, 'rx_x': {"1290": 0.5}}
+    # replacing the data entirely
+    vf.data = {'123': {'rx_x': {'300': 3.0}}}
+    assert vf.return_data('123', 350, 450) == {'rx_x': {'300': 3.0}}
+    # editing the data in place requires clearing the cached timestamps
+    vf.data['123']['rx_x']['400'] = 4.0
+    vf.invalidate_timestamp_index('123')
+    assert vf.return_data('123', 450, 550) == {'rx_x': {'400': 4.0}}
+
+
 def test_vessel_cleanup():
     testfile = get_test_vesselfile()
     os.remove(testfile)
@@ -232,6 +250,15 @@ def test_compare_dict():
     assert not new_waterline
 
 
+def test_copy_timestamped_data():
+    data = {'rx_x': {'1234': 1.0, '1244': 1.5}, 'waterline': {'1234': 0.5}}
+    newdata = copy_timestamped_data(data)
+    assert newdata == data
+    newdata['rx_x']['1234'] = 2.0
+    newdata['waterline']['1254'] = 0.6
+    assert data == {'rx_x': {'1234': 1.0, '1244': 1.5}, 'waterline': {'1234': 0.5}}
+
+
 def test_carry_over_optional():
     data_one = {"roll_patch_error": {"1584426525": 0.1, "1584438532": 0.1, "1597569340": 0.1},
                 "roll_sensor_error": {"1584426525": 0.0005, "1584438532": 0.0005, "1597569340": 0.0005},
@@ -1,7 +1,7 @@
 import shutil
 
 from HSTB.kluster.xarray_conversion import *
-from HSTB.kluster.xarray_conversion import _xarr_is_bit_set, _build_serial_mask, _return_xarray_mintime, \
+from HSTB.kluster.xarray_conversion import _xarr_is_bit_set, _np_is_bit_set, _build_serial_mask, _return_xarray_mintime, \
     _return_xarray_timelength, _divide_xarray_indicate_empty_future, _return_xarray_constant_blocks, \
     _merge_constant_blocks, _assess_need_for_split_correction, _correct_for_splits, _closest_prior_key_value, \
     _closest_key_value
@@ -10,11 +10,12 @@ from HSTB.kluster import kluster_variables
 
 
 datapath = ''
+test_data_folder = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'test_data')
 
 
 def get_testfile_paths():
-    testfile = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'test_data', '0009_20170523_181119_FA2806.all')
-    expected_output = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'test_data', 'converted')
+    testfile = os.path.join(test_data_folder, '0009_20170523_181119_FA2806.all')
+    expected_output = os.path.join(test_data_folder, 'converted')
     return testfile, expected_output
 
 
@@ -89,6 +90,13 @@ def test_xarr_is_bit_set():
     # 4 5 6 7 all have the third bit set
     ans = np.array([False, False, False, False, True, True, True, True, False, False])
     assert np.array_equal(_xarr_is_bit_set(tst, 3), ans)
+    assert np.array_equal(_xarr_is_bit_set(tst.chunk(3), 3), ans)
+
+
+def test_np_is_bit_set():
+    ans = np.array([False, False, False, False, True, True, True, True, False, False])
+    assert np.array_equal(_np_is_bit_set(np.arange(10), 3), ans)
+    assert np.array_equal(_np_is_bit_set(np.arange(10, dtype=np.float32), 3), ans)
 
 
 def test_build_serial_mask():